@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from jobs.queue import task
+
+
+@task('authentication.send_password_reset_email')
+def send_password_reset_email(email, reset_link):
+    send_mail(
+        'Password Reset Request',
+        f'Click the link to reset your password: {reset_link}',
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        fail_silently=False,
+    )
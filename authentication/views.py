@@ -4,9 +4,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.conf import settings
 from .models import PasswordResetToken
+from .tasks import send_password_reset_email
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
@@ -97,13 +96,7 @@ def request_password_reset(request):
         
         # Send email (in production, use proper email service)
         reset_link = f"http://localhost:8000/reset-password/{token}"
-        send_mail(
-            'Password Reset Request',
-            f'Click the link to reset your password: {reset_link}',
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
-        )
+        send_password_reset_email.enqueue(email=email, reset_link=reset_link)
         
         return Response({'message': 'Password reset link sent to your email'})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -14,6 +14,10 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ('user__email',)
     inlines = [CartItemInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Cart.refresh_totals([form.instance.pk])
+
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
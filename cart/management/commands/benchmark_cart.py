@@ -0,0 +1,85 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from cart.views import CartView
+from products.models import Category, Product, ProductImage, ProductVariant
+
+CART_SIZES = [1, 20, 200]
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and latency of GET /api/cart/ for carts of 1, 20 and 200 lines (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            variants = self.seed(max(CART_SIZES))
+            for size in CART_SIZES:
+                user = get_user_model().objects.create_user(
+                    username=f'cart-bench-{size}', email=f'cart-bench-{size}@example.com', password='unused'
+                )
+                cart = Cart.objects.create(user=user)
+                CartItem.objects.bulk_create(
+                    [CartItem(cart=cart, product_variant=variant, quantity=2) for variant in variants[:size]]
+                )
+                self.compare(user, size, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        category = Category.objects.create(name='Cart benchmark')
+        products = Product.objects.bulk_create([
+            Product(name=f'Cart benchmark {i}', description='Benchmark', price=Decimal(10 + i), category=category)
+            for i in range(count)
+        ])
+        ProductImage.objects.bulk_create(
+            [ProductImage(product=product, image='products/default.jpg', is_primary=True) for product in products]
+        )
+        return ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, size='M', color='Black', sku=f'CART-BENCH-{product.pk}', stock_quantity=10)
+            for product in products
+        ])
+
+    def request_for(self, user):
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')), 'localhost')
+        request = APIRequestFactory().get('/api/cart/', HTTP_HOST=host)
+        force_authenticate(request, user=user)
+        return request
+
+    def timed(self, render, repeat):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                render()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(queries.captured_queries)
+
+    def compare(self, user, size, repeat):
+        view = CartView.as_view()
+
+        def eager():
+            view(self.request_for(user)).render()
+
+        def lazy():
+            # The cart serialized straight from the model, as CartView did before eager loading
+            cart = Cart.objects.get(user=user)
+            CartSerializer(cart, context={'request': self.request_for(user)}).data
+
+        lazy_time, lazy_queries = self.timed(lazy, repeat)
+        eager_time, eager_queries = self.timed(eager, repeat)
+        self.stdout.write(
+            f'{size} lines: unprefetched {lazy_queries} queries / {lazy_time * 1000:.1f}ms, '
+            f'CartView {eager_queries} queries / {eager_time * 1000:.1f}ms'
+        )
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    for cart in Cart.objects.prefetch_related('items__product_variant__product').iterator(chunk_size=500):
+        items = list(cart.items.all())
+        cart.item_count = len(items)
+        cart.quantity_count = sum(item.quantity for item in items)
+        cart.subtotal_amount = sum((item.quantity * item.product_variant.product.price for item in items), 0)
+        cart.save(update_fields=['item_count', 'quantity_count', 'subtotal_amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_cart_discount_amount_cart_discount_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='quantity_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,66 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from orders.models import DiscountCode
+from products import pricing
+from products.coupons import coupon_rules
 from products.models import ProductVariant
 
 User = get_user_model()
 
 
+def discount_rule(code):
+    """The CouponRule for a cart's discount code, or None if there is none or it is no longer valid."""
+    if not code:
+        return None
+    rule = coupon_rules.get(DiscountCode, code)
+    return rule if rule is not None and rule.is_valid() else None
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     discount_code = models.CharField(max_length=50, blank=True, null=True)
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Maintained by refresh_totals() so the navbar summary never touches the items
+    item_count = models.PositiveIntegerField(default=0)
+    quantity_count = models.PositiveIntegerField(default=0)
+    subtotal_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Cart for {self.user.email}"
 
+    @classmethod
+    def refresh_totals(cls, carts):
+        """Recompute the counters of ``carts`` (a queryset or ids) with a single UPDATE."""
+        if not isinstance(carts, models.QuerySet):
+            carts = cls.objects.filter(pk__in=carts)
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        line_total = ExpressionWrapper(
+            F('quantity') * Coalesce('product_variant__price', 'product_variant__product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        carts.update(
+            item_count=Coalesce(Subquery(items.annotate(total=Count('id')).values('total')), 0),
+            quantity_count=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+            subtotal_amount=Coalesce(
+                Subquery(items.annotate(total=Sum(line_total)).values('total')),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    def lines(self):
+        return [(item.product_variant, item.quantity) for item in self.items.all()]
+
+    def quote(self):
+        rule = discount_rule(self.discount_code)
+        return pricing.quote(self.lines(), [rule] if rule else [])
+
     @property
     def total_items(self):
         # Count unique cart items, not quantities
@@ -26,11 +72,12 @@ class Cart(models.Model):
 
     @property
     def subtotal(self):
-        return sum(item.total_price for item in self.items.all())
+        return pricing.quote(self.lines()).subtotal
 
     @property
     def total_price(self):
-        return max(0, self.subtotal - self.discount_amount)
+        quote = self.quote()
+        return max(0, quote.subtotal - quote.discount_amount)
 
 
 class CartItem(models.Model):
@@ -48,4 +95,4 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
-        return self.product_variant.product.price * self.quantity
+        return pricing.unit_price(self.product_variant) * self.quantity
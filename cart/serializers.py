@@ -34,6 +34,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return cart_item
 
 class CartSerializer(serializers.ModelSerializer):
+    # With CartView's prefetch, items and both totals read the same loaded list
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.ReadOnlyField()
     total_price = serializers.ReadOnlyField()
@@ -42,7 +43,3 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ('id', 'items', 'total_items', 'total_price', 'created_at', 'updated_at')
 
-    def get_cart_count(self, obj):
-        from .models import CartItem
-        return CartItem.objects.filter(cart=obj).count()
-
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from products.models import Product, ProductVariant
+
+from .models import Cart
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_subtotals(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Carts holding a product keep a cached subtotal, so a price change refreshes them."""
+    if raw or created or (update_fields is not None and 'price' not in update_fields):
+        return
+    Cart.refresh_totals(Cart.objects.filter(items__product_variant__product=instance))
+
+
+@receiver(post_save, sender=ProductVariant)
+def refresh_cart_subtotals_for_variant(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """A variant's own price overrides the product price in cart subtotals."""
+    if raw or created or (update_fields is not None and 'price' not in update_fields):
+        return
+    Cart.refresh_totals(Cart.objects.filter(items__product_variant=instance))
+
+
+@receiver(pre_delete, sender=ProductVariant)
+def remember_variant_carts(sender, instance, **kwargs):
+    # The cart items go with the variant, so the carts are looked up before the delete
+    instance._cart_ids = list(Cart.objects.filter(items__product_variant=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=ProductVariant)
+def refresh_cart_subtotals_after_variant_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.refresh_totals(cart_ids)
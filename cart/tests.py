@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductVariant
+
+from .models import Cart, CartItem
+
+User = get_user_model()
+
+
+class CartCounterTests(TestCase):
+    """The counters behind /api/cart/summary/ follow price changes on products and variants."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', email='shopper@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Shirts')
+        self.product = Product.objects.create(name='Shirt', description='cotton', price=Decimal('20.00'), category=category)
+        self.variant = ProductVariant.objects.create(product=self.product, size='M', color='Blue', sku='SHIRT-M', stock_quantity=10)
+        self.other = ProductVariant.objects.create(product=self.product, size='L', color='Blue', sku='SHIRT-L', stock_quantity=10)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product_variant=self.variant, quantity=2)
+        CartItem.objects.create(cart=self.cart, product_variant=self.other, quantity=1)
+        Cart.refresh_totals([self.cart.pk])
+
+    def summary(self):
+        response = self.client.get('/api/cart/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_product_price_change(self):
+        self.product.price = Decimal('25.00')
+        self.product.save()
+        self.assertEqual(Decimal(str(self.summary()['subtotal'])), Decimal('75.00'))
+
+    def test_variant_price_change(self):
+        self.assertEqual(Decimal(str(self.summary()['subtotal'])), Decimal('60.00'))
+        self.variant.price = Decimal('30.00')
+        self.variant.save()
+        self.assertEqual(Decimal(str(self.summary()['subtotal'])), Decimal('80.00'))
+        self.variant.price = None
+        self.variant.save(update_fields=['price'])
+        self.assertEqual(Decimal(str(self.summary()['subtotal'])), Decimal('60.00'))
+
+    def test_variant_delete(self):
+        self.variant.delete()
+        summary = self.summary()
+        self.assertEqual(summary['total_items'], 1)
+        self.assertEqual(Decimal(str(summary['subtotal'])), Decimal('20.00'))
@@ -3,22 +3,62 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Cart, CartItem
+from django.utils.http import quote_etag
+from .models import Cart, CartItem, discount_rule
 from .serializers import CartSerializer, CartItemSerializer
 from products.models import ProductVariant
+from products import pricing
+from products.coupons import coupon_rules, normalize_code
+from products.serializers import primary_image_prefetch
 from orders.models import DiscountCode
 
 
+def cart_items_prefetch():
+    """Cart items with their variant and product in one query, plus one query for primary images."""
+    return (
+        Prefetch('items', CartItem.objects.select_related('product_variant__product').order_by('id')),
+        primary_image_prefetch('items__product_variant__product__images'),
+    )
+
+
 class CartView(generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.prefetch_related(*cart_items_prefetch()).get_or_create(user=self.request.user)
         return cart
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cart_summary(request):
+    """Item count and totals for the navbar badge, read from the cart's counters"""
+    summary = Cart.objects.filter(user=request.user).values(
+        'item_count', 'quantity_count', 'subtotal_amount', 'discount_code'
+    ).first() or {'item_count': 0, 'quantity_count': 0, 'subtotal_amount': pricing.ZERO, 'discount_code': None}
+
+    subtotal = summary['subtotal_amount']
+    rule = discount_rule(summary['discount_code'])
+    discount_amount = pricing.coupon_discount(rule, subtotal) if rule else pricing.ZERO
+
+    etag = quote_etag(f"{summary['item_count']}-{summary['quantity_count']}-{subtotal}-{discount_amount}")
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response({
+        'total_items': summary['item_count'],
+        'total_quantity': summary['quantity_count'],
+        'subtotal': float(subtotal),
+        'discount_amount': float(discount_amount),
+        'total_price': float(subtotal - discount_amount),
+    }, headers=headers)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_to_cart(request):
@@ -57,6 +97,7 @@ def add_to_cart(request):
         cart_item.quantity = new_quantity
         cart_item.save()
 
+    Cart.refresh_totals([cart.pk])
     serializer = CartItemSerializer(cart_item)
     # Return 201 only for new items, 200 for quantity updates
     return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -77,6 +118,7 @@ def update_cart_item(request, item_id):
 
     if int(quantity) <= 0:
         cart_item.delete()
+        Cart.refresh_totals([cart_item.cart_id])
         return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
 
     try:
@@ -89,6 +131,7 @@ def update_cart_item(request, item_id):
 
     cart_item.quantity = quantity
     cart_item.save()
+    Cart.refresh_totals([cart_item.cart_id])
 
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data)
@@ -104,6 +147,7 @@ def remove_from_cart(request, item_id):
         return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
 
     cart_item.delete()
+    Cart.refresh_totals([cart_item.cart_id])
     return Response({'message': 'Item removed from cart'}, status=status.HTTP_200_OK)
 
 
@@ -114,6 +158,7 @@ def clear_cart(request):
     try:
         cart = Cart.objects.get(user=request.user)
         cart.items.all().delete()
+        Cart.refresh_totals([cart.pk])
         return Response({'message': 'Cart cleared'}, status=status.HTTP_200_OK)
     except Cart.DoesNotExist:
         return Response({'message': 'Cart is already empty'}, status=status.HTTP_200_OK)
@@ -123,85 +168,36 @@ def clear_cart(request):
 @permission_classes([IsAuthenticated])
 def apply_discount(request):
     """Apply discount code to cart"""
-    code = request.data.get('code', '').strip().upper()
-    
+    code = normalize_code(request.data.get('code'))
     if not code:
         return Response({'error': 'Discount code is required'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    try:
-        discount = DiscountCode.objects.get(code=code)
-    except DiscountCode.DoesNotExist:
+
+    discount = coupon_rules.get(DiscountCode, code)
+    if discount is None or not discount.is_active:
         return Response({'error': 'Invalid discount code'}, status=status.HTTP_400_BAD_REQUEST)
-    
     if not discount.is_valid():
         return Response({'error': 'Discount code is expired or inactive'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    
-    # Check minimum order amount
-    if cart.subtotal < discount.minimum_order_amount:
+
+    cart = Cart.objects.prefetch_related(*cart_items_prefetch()).filter(user=request.user).first()
+    if cart is None or not cart.items.all():
+        return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+    quote = pricing.quote(cart.lines(), [discount])
+    if not quote.discounts:
         return Response({
             'error': f'Minimum order amount of ${discount.minimum_order_amount} required'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Calculate discount amount
-    if discount.discount_type == 'percentage':
-        discount_amount = (cart.subtotal * discount.discount_value) / 100
-    else:  # fixed amount
-        discount_amount = discount.discount_value
-    
-    # Apply discount
-    cart.discount_code = code
-    cart.discount_amount = discount_amount
-    cart.save()
-    
-    return Response({
-        'message': f'Discount code "{code}" applied successfully!',
-        'discount_amount': float(discount_amount),
-        'new_total': float(cart.total_price)
-    }, status=status.HTTP_200_OK)
 
+    cart.discount_code = discount.code
+    cart.discount_amount = quote.discount_amount
+    cart.save(update_fields=['discount_code', 'discount_amount', 'updated_at'])
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def apply_discount(request):
-    """Apply discount code to cart"""
-    try:
-        cart = Cart.objects.get(user=request.user)
-        code = request.data.get('code')
-        
-        if not code:
-            return Response({'error': 'Discount code is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            discount = DiscountCode.objects.get(code=code, is_active=True)
-        except DiscountCode.DoesNotExist:
-            return Response({'error': 'Invalid discount code'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if discount is valid
-        if not discount.is_valid():
-            return Response({'error': 'Discount code has expired'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Calculate discount amount
-        subtotal = cart.subtotal
-        if discount.discount_type == 'percentage':
-            discount_amount = subtotal * (discount.discount_value / 100)
-        else:
-            discount_amount = min(discount.discount_value, subtotal)
-        
-        # Apply discount
-        cart.discount_code = discount.code
-        cart.discount_amount = discount_amount
-        cart.save()
-        
-        return Response({
-            'message': 'Discount applied successfully',
-            'discount_amount': float(discount_amount),
-            'discount_code': discount.code
-        }, status=status.HTTP_200_OK)
-        
-    except Cart.DoesNotExist:
-        return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'message': f'Discount code "{discount.code}" applied successfully!',
+        'discount_amount': float(quote.discount_amount),
+        'discount_code': discount.code,
+        'new_total': float(quote.subtotal - quote.discount_amount),
+    }, status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
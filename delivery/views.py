@@ -3,6 +3,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import DeliveryZone, DeliveryCheck
 from django.utils import timezone
+from fashion_store.pagination import paginated_response
+from fashion_store.streaming import ndjson_response, wants_stream
 
 
 @api_view(['GET'])
@@ -29,21 +31,25 @@ def check_delivery(request, pincode):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def zone_data(zone):
+    return {
+        'pincode': zone.pincode,
+        'city': zone.city,
+        'state': zone.state,
+        'country': zone.country,
+        'delivery_charge': float(zone.delivery_charge),
+        'estimated_days': zone.estimated_days,
+        'is_deliverable': zone.is_deliverable
+    }
+
+
 @api_view(['GET'])
 def delivery_zones(request):
-    """Get all available delivery zones"""
+    """Get available delivery zones, paginated or as an NDJSON stream with ?stream=1"""
     zones = DeliveryZone.objects.filter(is_active=True).order_by('pincode')
-    
-    zone_data = []
-    for zone in zones:
-        zone_data.append({
-            'pincode': zone.pincode,
-            'city': zone.city,
-            'state': zone.state,
-            'country': zone.country,
-            'delivery_charge': float(zone.delivery_charge),
-            'estimated_days': zone.estimated_days,
-            'is_deliverable': zone.is_deliverable
-        })
-    
-    return Response(zone_data)
+
+    if wants_stream(request):
+        return ndjson_response(zones, zone_data)
+    return paginated_response(
+        request, zones, lambda page: [zone_data(zone) for zone in page], keyset_ordering='pincode'
+    )
@@ -0,0 +1,135 @@
+"""
+Response cache for catalog endpoints that look the same to every visitor.
+
+A cached entry is the ``response.data`` of a successful GET, stored under a
+key built from the catalog version, host, path and the sorted query string,
+so ``?a=1&b=2`` and ``?b=2&a=1`` share an entry. Catalog changes call
+bump_catalog_version() (see products.signals), which orphans every entry at
+once; orphans age out through their timeout. NDJSON streams are never cached.
+
+Entries live in the cache alias named by CATALOG_CACHE_ALIAS. The default
+alias is process-local memory; point it at a shared backend (Redis,
+Memcached) when running several workers so an invalidation reaches all of
+them. Hit and miss counters are kept in the same cache for catalog_stats().
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from .streaming import wants_stream
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def default_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TTL', 300)
+
+
+def catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock, not 1, so an evicted counter never reuses an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        catalog_version()
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def catalog_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else None,
+        'version': catalog_version(),
+    }
+
+
+def reset_catalog_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def cache_key(request):
+    query = '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+    digest = hashlib.md5(f'{request.get_host()}{request.path}?{query}'.encode('utf-8')).hexdigest()
+    # A conditional-GET ETag (products.conditional) is derived from the database,
+    # so it also moves on changes made by other processes or without signals
+    state = getattr(request, 'catalog_etag', None) or catalog_version()
+    return f'catalog:{state}:{digest}'
+
+
+def cached_response(request, render, timeout=None):
+    """Return the cached response for ``request``, or call ``render()`` and cache a 200."""
+    if request.method != 'GET' or wants_stream(request):
+        return render()
+
+    cache = get_cache()
+    key = cache_key(request)
+    data = cache.get(key)
+    if data is not None:
+        _count(HITS_KEY)
+        response = Response(data, status=status.HTTP_200_OK)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _count(MISSES_KEY)
+    response = render()
+    if response.status_code == status.HTTP_200_OK and isinstance(response, Response):
+        cache.set(key, response.data, default_timeout() if timeout is None else timeout)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_catalog_response(timeout=None):
+    """Cache a function view's GET responses; apply it below ``@api_view``."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(request, lambda: view_func(request, *args, **kwargs), timeout)
+        return wrapper
+    return decorator
+
+
+class CatalogCacheMixin:
+    """Cache a generic view's GET responses."""
+    catalog_cache_timeout = None
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(
+            request, lambda: super(CatalogCacheMixin, self).get(request, *args, **kwargs), self.catalog_cache_timeout
+        )
@@ -0,0 +1,198 @@
+"""
+Pagination used by every list endpoint.
+
+Page-number pagination stays the default so existing pages keep working.
+Two opt-ins avoid the cost of deep OFFSET scans and COUNT(*):
+
+* ``?cursor=`` switches to keyset pagination on ``(<ordering field>, id)``.
+  Each page is a range scan from an opaque cursor, so page 500 costs the
+  same as page 1. The response has no ``count``.
+* ``?count=false`` keeps page numbers but skips the COUNT(*) query.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size=20, default_ordering=None):
+        self.page_size = page_size
+        if default_ordering:
+            self.default_ordering = default_ordering
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(requested, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        """Single sort field (optionally '-' prefixed); ``id`` is always the tiebreaker."""
+        allowed = getattr(view, 'ordering_fields', None) or []
+        requested = request.query_params.get('ordering', '')
+        if requested and requested.lstrip('-') in allowed:
+            return requested
+        ordering = getattr(view, 'ordering', None) or self.default_ordering
+        if isinstance(ordering, (list, tuple)):
+            ordering = ordering[0]
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {'value': cursor['v'], 'pk': int(cursor['id']), 'reverse': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse=False):
+        cursor = {'v': self.field.value_to_string(row), 'id': row.pk}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(request, view)
+        descending = ordering.startswith('-')
+        field_name = ordering.lstrip('-')
+        try:
+            self.field = queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            raise NotFound(self.invalid_cursor_message)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        # Walking backwards flips both the comparison and the sort direction
+        scan_descending = descending != reverse
+        prefix = '-' if scan_descending else ''
+        queryset = queryset.order_by(f'{prefix}{field_name}', f'{prefix}pk')
+
+        if cursor:
+            try:
+                value = self.field.to_python(cursor['value'])
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if scan_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__{lookup}': value}) |
+                Q(**{field_name: value, f'pk__{lookup}': cursor['pk']})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class StorePagination(PageNumberPagination):
+    """Page-number pagination with opt-in keyset mode (``?cursor=``) and ``?count=false``."""
+    count_query_param = 'count'
+    keyset_ordering = None
+
+    def __init__(self, keyset_ordering=None):
+        if keyset_ordering:
+            self.keyset_ordering = keyset_ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.counted = True
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(page_size=self.get_page_size(request), default_ordering=self.keyset_ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        if request.query_params.get(self.count_query_param, '').lower() in ('0', 'false', 'no'):
+            self.counted = False
+            return self.paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=request.query_params.get(self.page_query_param), message='Invalid page.'))
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=self.page_number, message='Invalid page.'))
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        if not self.counted:
+            url = self.request.build_absolute_uri()
+            next_link = replace_query_param(url, self.page_query_param, self.page_number + 1) if self.has_next else None
+            previous_link = None
+            if self.page_number > 1:
+                previous_link = replace_query_param(url, self.page_query_param, self.page_number - 1)
+            return Response(OrderedDict([
+                ('next', next_link),
+                ('previous', previous_link),
+                ('results', data),
+            ]))
+        return super().get_paginated_response(data)
+
+
+def paginated_response(request, queryset, serialize, keyset_ordering=None):
+    """
+    Paginate ``queryset`` for a function-based view.
+
+    ``serialize`` turns the page (a list of model instances) into the list
+    placed under ``results``.
+    """
+    paginator = StorePagination(keyset_ordering=keyset_ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serialize(page))
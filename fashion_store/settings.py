@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'orders',
     'delivery',
     'frontend',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -164,7 +165,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'fashion_store.pagination.StorePagination',
     'PAGE_SIZE': 20,
 }
 
@@ -212,6 +213,25 @@ DEFAULT_FROM_EMAIL = 'noreply@fashionstore.com'
 # Custom user model
 AUTH_USER_MODEL = 'authentication.User'
 
+# Cache used for catalog API responses; switch BACKEND to Redis/Memcached when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fashion-store',
+    }
+}
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TTL = 300
+
+# Background jobs (see jobs/queue.py); run the worker with `python manage.py run_jobs`.
+# JOBS_EAGER runs jobs in-process after commit instead, for development without a worker.
+JOBS_EAGER = False
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_LOCK_TIMEOUT_SECONDS = 600
+JOB_RETENTION_DAYS = 7
+LOW_STOCK_THRESHOLD = 5
+
 # Login URL configuration
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
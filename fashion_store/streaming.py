@@ -0,0 +1,29 @@
+"""
+Newline-delimited JSON streaming for large result sets.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` and written one
+JSON document per line, so peak memory stays at one chunk no matter how
+many rows match. Prefetches on the queryset are applied per chunk.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_QUERY_PARAM = 'stream'
+DEFAULT_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    return request.query_params.get(STREAM_QUERY_PARAM, '').lower() in ('1', 'true', 'ndjson')
+
+
+def ndjson_response(queryset, serialize, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream ``serialize(row)`` for every row of ``queryset`` as NDJSON."""
+    def rows():
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield json.dumps(serialize(row), cls=JSONEncoder) + '\n'
+
+    response = StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+    response['X-Accel-Buffering'] = 'no'
+    return response
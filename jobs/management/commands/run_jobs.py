@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from jobs import queue
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (confirmation emails, stock alerts, rollups, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every due job, then exit')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = queue.worker_name()
+        total = 0
+        last_purge = 0
+        try:
+            while True:
+                claimed = queue.run_pending(batch_size=options['batch_size'], worker=worker)
+                total += claimed
+                if claimed:
+                    continue
+                if options['once']:
+                    break
+                if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                    queue.purge()
+                    last_purge = time.monotonic()
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} ran {total} jobs'))
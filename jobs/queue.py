@@ -0,0 +1,163 @@
+"""
+A small database-backed job queue.
+
+Work that does not have to finish inside a request is registered with the
+``@task`` decorator in an app's tasks.py and queued with enqueue(). The job
+row is written in the caller's transaction, so a job queued during checkout
+exists exactly when the order does, and a rolled-back checkout leaves no
+job behind. The run_jobs command is the worker (see the Procfile).
+
+Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where
+the database supports it, so several can run side by side. A failed job
+goes back to pending with exponential backoff:
+JOB_RETRY_BASE_SECONDS * 2**(attempts - 1), plus up to 10% jitter, capped
+at JOB_RETRY_MAX_SECONDS. After ``max_attempts`` it is marked failed and
+can be retried from the admin. A running job whose worker died is claimed
+again after JOB_LOCK_TIMEOUT_SECONDS, so tasks must be safe to run twice.
+
+Set JOBS_EAGER = True to run jobs in-process once the transaction commits,
+e.g. in development without a worker.
+"""
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, atomic):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.atomic = atomic
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+    def enqueue(self, delay=None, unique=False, **payload):
+        return enqueue(self.name, delay=delay, unique=unique, **payload)
+
+
+def task(name=None, max_attempts=5, atomic=True):
+    """
+    Register ``func`` as a job; keyword arguments must be JSON-serializable.
+
+    The task runs in one transaction, so a failed attempt leaves nothing
+    behind. Pass ``atomic=False`` for tasks that commit in steps themselves.
+    """
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', max_attempts, atomic)
+        TASKS[registered.name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(name, delay=None, unique=False, **payload):
+    """
+    Queue the task ``name`` with ``payload`` as keyword arguments.
+
+    ``delay`` (a timedelta) postpones the first run. With ``unique=True``
+    nothing is queued if a pending job of the same name already exists.
+    That check is not locked, so concurrent callers can still queue one each;
+    use it only for tasks where a duplicate run is harmless.
+    Returns the Job, or None when ``unique`` skipped it.
+    """
+    registered = TASKS[name]
+    if unique and Job.objects.filter(name=name, status='pending').exists():
+        return None
+    job = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=registered.max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_claimed([job]))
+    return job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)
+    seconds = base * 2 ** (attempts - 1) * (1 + random.random() * 0.1)
+    return timedelta(seconds=min(seconds, cap))
+
+
+def claim(batch_size=10, worker=None):
+    """Lock up to ``batch_size`` due jobs for this worker and return them."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT_SECONDS', 600))
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', run_after__lte=now) | Q(status='running', locked_at__lt=stale))
+            .order_by('run_after', 'id')[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='running', locked_at=now, locked_by=worker or worker_name()
+            )
+    return jobs
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    job.attempts += 1
+    try:
+        registered = TASKS.get(job.name)
+        if registered is None:
+            raise LookupError(f'No task registered as {job.name!r}')
+        if registered.atomic:
+            with transaction.atomic():
+                registered(**job.payload)
+        else:
+            registered(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + backoff(job.attempts)
+        job.locked_at = None
+        job.save(update_fields=['attempts', 'last_error', 'status', 'finished_at', 'run_after', 'locked_at'])
+        return False
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'finished_at', 'locked_at'])
+    return True
+
+
+def run_claimed(jobs):
+    return sum(run_job(job) for job in jobs)
+
+
+def run_pending(batch_size=10, worker=None):
+    """Claim and run one batch of due jobs. Returns how many were claimed."""
+    jobs = claim(batch_size=batch_size, worker=worker)
+    run_claimed(jobs)
+    return len(jobs)
+
+
+def purge(days=None):
+    """Delete jobs that finished successfully more than ``days`` (JOB_RETENTION_DAYS) ago."""
+    days = getattr(settings, 'JOB_RETENTION_DAYS', 7) if days is None else days
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, run_pending, task
+
+calls = []
+
+
+@task('jobs.tests.flaky', max_attempts=3)
+def flaky(fail=True):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('flaky task failed')
+
+
+@override_settings(JOB_RETRY_BASE_SECONDS=30, JOB_RETRY_MAX_SECONDS=3600, JOB_LOCK_TIMEOUT_SECONDS=600, JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def make_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    def test_failed_job_backs_off_then_fails(self):
+        job = flaky.enqueue()
+        for attempt, base in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.assertEqual(run_pending(), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('pending', attempt))
+            self.assertIn('flaky task failed', job.last_error)
+            self.assertIsNone(job.locked_at)
+            delay = job.run_after - before
+            self.assertGreaterEqual(delay, timedelta(seconds=base))
+            self.assertLessEqual(delay, timedelta(seconds=base * 1.1 + 1))
+            self.assertEqual(run_pending(), 0)
+            self.make_due(job)
+
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIsNotNone(job.finished_at)
+        self.make_due(job)
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(len(calls), 3)
+
+    def test_successful_job_is_done(self):
+        job = enqueue('jobs.tests.flaky', fail=False)
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('done', 1, ''))
+        self.assertEqual(calls, [False])
+
+    def test_stale_running_job_is_reclaimed(self):
+        stale = flaky.enqueue(fail=False)
+        fresh = flaky.enqueue(fail=False)
+        self.assertEqual(len(claim(worker='dead')), 2)
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+
+        reclaimed = claim(worker='alive')
+        self.assertEqual([job.pk for job in reclaimed], [stale.pk])
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), ('running', 'alive'))
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.locked_by, 'dead')
+        self.assertEqual(claim(worker='alive'), [])
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem, DiscountCode
+from django.contrib.auth.base_user import BaseUserManager
+from .models import Order, OrderItem, DiscountCode, SalesRollup
 
 
 class OrderItemInline(admin.TabularInline):
@@ -12,8 +13,18 @@ class OrderItemInline(admin.TabularInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_number', 'user', 'status', 'payment_status', 'total_amount', 'created_at')
     list_filter = ('status', 'payment_status', 'created_at')
-    search_fields = ('order_number', 'user__email')
+    # A prefix lookup can use the order number index; emails are matched exactly in get_search_results
+    search_fields = ('^order_number',)
     ordering = ('-created_at',)
+    list_select_related = ('user',)
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if '@' in term:
+            # '=user__email' would be iexact, an UPPER() comparison the email index cannot answer
+            return queryset.filter(user__email=BaseUserManager.normalize_email(term)), False
+        return super().get_search_results(request, queryset, search_term)
     inlines = [OrderItemInline]
     readonly_fields = ('order_number', 'created_at', 'updated_at')
 
@@ -31,3 +42,12 @@ class DiscountCodeAdmin(admin.ModelAdmin):
     list_filter = ('discount_type', 'is_active', 'valid_until')
     search_fields = ('code', 'description')
     ordering = ('-created_at',)
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'dimension', 'key', 'label', 'orders', 'units', 'revenue', 'discount', 'tax')
+    list_filter = ('dimension', 'day')
+    search_fields = ('key', 'label')
+    ordering = ('-day', 'dimension', '-revenue')
+    readonly_fields = ('day', 'dimension', 'key', 'label', 'orders', 'units', 'revenue', 'discount', 'tax', 'updated_at')
@@ -0,0 +1,88 @@
+import threading
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cart.models import Cart, CartItem
+from orders.models import OrderItem
+from orders.views import create_order_from_cart
+from products.models import Category, Product, ProductVariant
+
+ADDRESS = {
+    'shipping_address': '1 Test Street',
+    'shipping_city': 'Test City',
+    'shipping_state': 'TS',
+    'shipping_zip': '00000',
+    'shipping_country': 'Testland',
+}
+
+
+class Command(BaseCommand):
+    help = 'Run parallel checkouts against one low-stock variant and verify it is never oversold (test data is deleted afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=20)
+        parser.add_argument('--stock', type=int, default=5)
+        parser.add_argument('--quantity', type=int, default=1)
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        category = Category.objects.create(name=f'Checkout concurrency {run}')
+        product = Product.objects.create(name=f'Checkout concurrency {run}', description='Test', price=Decimal('10.00'), category=category)
+        variant = ProductVariant.objects.create(product=product, size='M', color='Black', sku=f'CHECKOUT-{run}', stock_quantity=options['stock'])
+        users = []
+        try:
+            for i in range(options['buyers']):
+                user = User.objects.create_user(username=f'checkout-{run}-{i}', email=f'checkout-{run}-{i}@example.com', password='unused')
+                cart = Cart.objects.create(user=user)
+                CartItem.objects.create(cart=cart, product_variant=variant, quantity=options['quantity'])
+                users.append(user)
+
+            results = self.checkout_in_parallel(users)
+            self.report(variant, results, options)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+            category.delete()
+
+    def checkout_in_parallel(self, users):
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')), 'localhost')
+        barrier = threading.Barrier(len(users))
+        results = []
+
+        def buy(user):
+            request = APIRequestFactory().post('/api/orders/create-from-cart/', ADDRESS, format='json', HTTP_HOST=host)
+            force_authenticate(request, user=user)
+            try:
+                barrier.wait()
+                results.append(create_order_from_cart(request).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, variant, results, options):
+        variant.refresh_from_db()
+        placed = results.count(201)
+        sold = sum(OrderItem.objects.filter(product_variant=variant).values_list('quantity', flat=True))
+        expected = min(options['buyers'], options['stock'] // options['quantity'])
+        self.stdout.write(
+            f'{placed} of {len(results)} checkouts succeeded, {sold} units sold, '
+            f'{variant.stock_quantity} left of {options["stock"]}'
+        )
+        if variant.stock_quantity < 0 or sold + variant.stock_quantity != options['stock'] or sold != placed * options['quantity']:
+            self.stdout.write(self.style.ERROR('Stock and order items disagree: variant was oversold'))
+        elif placed < expected:
+            self.stdout.write(self.style.WARNING(f'Only {placed} of {expected} possible checkouts succeeded (lock timeouts?)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No overselling'))
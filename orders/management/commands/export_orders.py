@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.export import DEFAULT_CHUNK_SIZE, export_orders
+from orders.models import Order
+from orders.views import staff_order_filters
+
+
+class Command(BaseCommand):
+    help = 'Export order lines to a gzip-compressed CSV or Parquet file, reading the database in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='created_from', metavar='YYYY-MM-DD', help='First order day (inclusive)')
+        parser.add_argument('--to', dest='created_to', metavar='YYYY-MM-DD', help='Last order day (inclusive)')
+        parser.add_argument('--status', help='Only orders with this status')
+        parser.add_argument('--payment-status', help='Only orders with this payment status')
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+        parser.add_argument('--output', help='Output file (default: orders.csv.gz or orders.parquet)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        params = {
+            'created_from': options['created_from'],
+            'created_to': options['created_to'],
+            'status': options['status'],
+            'payment_status': options['payment_status'],
+        }
+        try:
+            orders = Order.objects.filter(staff_order_filters({k: v for k, v in params.items() if v}))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        fmt = options['format']
+        output = options['output'] or ('orders.parquet' if fmt == 'parquet' else 'orders.csv.gz')
+        try:
+            count = export_orders(output, orders, fmt=fmt, chunk_size=options['chunk_size'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} order lines to {output}'))
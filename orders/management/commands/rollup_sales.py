@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold orders placed since the last run into the daily sales rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Orders per transaction')
+        parser.add_argument('--lag-minutes', type=int, default=5,
+                            help='Leave orders younger than this for the next run')
+        parser.add_argument('--rebuild-from', metavar='YYYY-MM-DD',
+                            help='Recompute rollups from this day, e.g. after orders were cancelled')
+
+    def handle(self, *args, **options):
+        if options['rebuild_from']:
+            since = parse_date(options['rebuild_from'])
+            if since is None:
+                raise CommandError('--rebuild-from must be a date (YYYY-MM-DD)')
+            count = rollups.rebuild(since, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups from {since} ({count} orders)'))
+
+        count = rollups.run(batch_size=options['batch_size'], lag=timedelta(minutes=options['lag_minutes']))
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {count} new orders'))
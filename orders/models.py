@@ -52,12 +52,22 @@ class Order(models.Model):
     # Tracking
     tracking_number = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
+
+    # Set by the orders.record_trending job so a retried job does not count the order twice
+    trending_recorded = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # Staff order filters (orders.views.staff_order_filters)
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+            models.Index(fields=['payment_status', 'created_at', 'id'], name='order_payment_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
@@ -84,6 +94,8 @@ class OrderItem(models.Model):
 
 
 class DiscountCode(models.Model):
+    USAGE_LIMIT_FIELD = 'max_uses'
+
     code = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
     discount_type = models.CharField(max_length=20, choices=[
@@ -110,3 +122,46 @@ class DiscountCode(models.Model):
             self.valid_from <= now <= self.valid_until and
             (self.max_uses is None or self.used_count < self.max_uses)
         )
+
+
+class SalesRollup(models.Model):
+    """Daily sales totals per product, category, brand, gender and store-wide, maintained by orders.rollups."""
+    DIMENSION_CHOICES = [
+        ('all', 'All sales'),
+        ('product', 'Product'),
+        ('category', 'Category'),
+        ('brand', 'Brand'),
+        ('gender', 'Gender'),
+    ]
+
+    day = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True)  # product/category id, brand name or gender code
+    label = models.CharField(max_length=200, blank=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'day', 'key'], name='sales_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'key', 'day'], name='sales_rollup_key_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}:{self.key or '-'}"
+
+
+class RollupWatermark(models.Model):
+    """The last order folded into the rollups named ``name``."""
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ order {self.last_order_id}"
@@ -0,0 +1,170 @@
+"""
+Daily sales rollups.
+
+run() folds orders into SalesRollup rows: one row per day and product,
+category, brand and gender, plus a store-wide 'all' row. Each row holds
+orders, units, revenue, discount and tax. Orders are read in id windows
+past the RollupWatermark. Each window is aggregated in the database (one
+GROUP BY per dimension), merged into the rollups, and the watermark moves,
+all in one transaction. A run can stop at any point and resume. Reports
+read the rollups and never scan the order tables.
+
+Only orders older than ``lag`` are read, so a checkout still committing
+with a lower id cannot be skipped. Order-level discount and tax are spread
+over the order's lines in proportion to line revenue, so per-dimension
+amounts can differ from the order totals by rounding. Cancelled orders are
+left out. Orders cancelled after they were rolled up are only dropped by
+rebuild(), which recomputes days from scratch.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, RollupWatermark, SalesRollup
+
+WATERMARK_NAME = 'sales'
+CENT = Decimal('0.01')
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+PRODUCT = 'product_variant__product__'
+
+# dimension -> (key field, label field); 'all' groups by day only
+DIMENSIONS = {
+    'all': (None, None),
+    'product': (f'{PRODUCT}id', f'{PRODUCT}name'),
+    'category': (f'{PRODUCT}category_id', f'{PRODUCT}category__name'),
+    'brand': (f'{PRODUCT}brand', f'{PRODUCT}brand'),
+    'gender': (f'{PRODUCT}gender', f'{PRODUCT}gender'),
+}
+
+SUMMED_FIELDS = ('orders', 'units', 'revenue', 'discount', 'tax')
+
+
+def _line_share(order_field):
+    """The line's share of an order-level amount, by line revenue."""
+    return ExpressionWrapper(
+        F('price') * F('quantity') * F(f'order__{order_field}') / NullIf(F('order__subtotal'), Value(0)),
+        output_field=AMOUNT,
+    )
+
+
+def aggregate_items(items):
+    """{(dimension, day, key): totals} for ``items``, one GROUP BY query per dimension."""
+    items = items.annotate(day=TruncDate('order__created_at'))
+    totals = {}
+    for dimension, (key_field, label_field) in DIMENSIONS.items():
+        group_by = ['day'] + [field for field in (key_field, label_field) if field]
+        rows = items.order_by().values(*dict.fromkeys(group_by)).annotate(
+            row_orders=Count('order_id', distinct=True),
+            row_units=Sum('quantity'),
+            row_revenue=Sum(ExpressionWrapper(F('price') * F('quantity'), output_field=AMOUNT)),
+            row_discount=Coalesce(Sum(_line_share('discount_amount')), Value(Decimal('0')), output_field=AMOUNT),
+            row_tax=Coalesce(Sum(_line_share('tax_amount')), Value(Decimal('0')), output_field=AMOUNT),
+        )
+        for row in rows:
+            key = str(row[key_field]) if key_field and row[key_field] is not None else ''
+            totals[(dimension, row['day'], key)] = {
+                'label': (row[label_field] or '') if label_field else '',
+                'orders': row['row_orders'],
+                'units': row['row_units'] or 0,
+                'revenue': Decimal(row['row_revenue'] or 0).quantize(CENT),
+                'discount': Decimal(row['row_discount'] or 0).quantize(CENT),
+                'tax': Decimal(row['row_tax'] or 0).quantize(CENT),
+            }
+    return totals
+
+
+def merge(totals):
+    """Add ``totals`` to the stored rollups: one read per dimension, then bulk update and create."""
+    created = []
+    now = timezone.now()
+    for dimension in DIMENSIONS:
+        wanted = {(day, key): values for (dim, day, key), values in totals.items() if dim == dimension}
+        if not wanted:
+            continue
+        existing = SalesRollup.objects.filter(
+            dimension=dimension,
+            day__in={day for day, _ in wanted},
+            key__in={key for _, key in wanted},
+        )
+        changed = []
+        for rollup in existing:
+            values = wanted.pop((rollup.day, rollup.key), None)
+            if values is None:
+                continue
+            for field in SUMMED_FIELDS:
+                setattr(rollup, field, getattr(rollup, field) + values[field])
+            rollup.label = values['label'] or rollup.label
+            rollup.updated_at = now
+            changed.append(rollup)
+        SalesRollup.objects.bulk_update(changed, SUMMED_FIELDS + ('label', 'updated_at'))
+        created.extend(
+            SalesRollup(dimension=dimension, day=day, key=key, **values) for (day, key), values in wanted.items()
+        )
+    SalesRollup.objects.bulk_create(created)
+
+
+def rollup_items(first_order_id, last_order_id):
+    """Items of rollup-eligible orders with ids in (first_order_id, last_order_id]."""
+    return OrderItem.objects.filter(
+        order_id__gt=first_order_id, order_id__lte=last_order_id
+    ).exclude(order__status='cancelled')
+
+
+def pending_orders():
+    """Orders not yet folded into the rollups."""
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_order_id', flat=True).first()
+    return Order.objects.filter(id__gt=watermark or 0)
+
+
+def run(batch_size=5000, lag=timedelta(minutes=5)):
+    """Fold every order past the watermark and older than ``lag`` into the rollups. Returns orders read."""
+    RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    cutoff = timezone.now() - lag
+    high = Order.objects.filter(created_at__lte=cutoff).order_by('-id').values_list('id', flat=True).first()
+    processed = 0
+    while high:
+        with transaction.atomic():
+            # The lock keeps concurrent runs from folding the same window twice
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            if watermark.last_order_id >= high:
+                break
+            window = list(
+                Order.objects.filter(id__gt=watermark.last_order_id, id__lte=high)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not window:
+                break
+            merge(aggregate_items(rollup_items(watermark.last_order_id, window[-1])))
+            watermark.last_order_id = window[-1]
+            watermark.save(update_fields=['last_order_id', 'updated_at'])
+        processed += len(window)
+    return processed
+
+
+def rebuild(since, batch_size=5000):
+    """Recompute the rollups for days from ``since`` (a date) up to the watermark. Returns orders read."""
+    processed = 0
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        SalesRollup.objects.filter(day__gte=since).delete()
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        low = Order.objects.filter(created_at__gte=start).order_by('id').values_list('id', flat=True).first()
+        if low is None:
+            return 0
+        low -= 1
+        while low < watermark.last_order_id:
+            window = list(
+                Order.objects.filter(id__gt=low, id__lte=watermark.last_order_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not window:
+                break
+            merge(aggregate_items(rollup_items(low, window[-1]).filter(order__created_at__gte=start)))
+            low = window[-1]
+            processed += len(window)
+    return processed
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, DiscountCode
+from products.coupons import coupon_rules
+from products.models import ProductImage
 from products.serializers import ProductVariantSerializer
 
 
@@ -31,6 +33,28 @@ class OrderSerializer(serializers.ModelSerializer):
         return order
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """One row of the order history; reads the annotations added by views.with_order_summary()."""
+    user_email = serializers.CharField(source='user.email', read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = (
+            'id', 'order_number', 'user_email', 'status', 'payment_status', 'subtotal', 'discount_amount',
+            'total_amount', 'tracking_number', 'item_count', 'total_quantity', 'thumbnail', 'created_at',
+        )
+
+    def get_thumbnail(self, obj):
+        if not obj.thumbnail:
+            return None
+        url = ProductImage._meta.get_field('image').storage.url(obj.thumbnail)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
 class OrderCreateSerializer(serializers.Serializer):
     shipping_address = serializers.CharField()
     shipping_city = serializers.CharField()
@@ -47,12 +71,11 @@ class OrderCreateSerializer(serializers.Serializer):
 
     def validate_discount_code(self, value):
         if value:
-            try:
-                discount = DiscountCode.objects.get(code=value)
-                if not discount.is_valid():
-                    raise serializers.ValidationError('Invalid or expired discount code')
-            except DiscountCode.DoesNotExist:
+            discount = coupon_rules.get(DiscountCode, value)
+            if discount is None:
                 raise serializers.ValidationError('Invalid discount code')
+            if not discount.is_valid():
+                raise serializers.ValidationError('Invalid or expired discount code')
         return value
 
 
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import mail_admins, send_mail
+
+from jobs.queue import task
+from products import trending
+from products.models import ProductVariant
+
+from . import rollups
+from .models import Order, OrderItem
+
+ROLLUP_LAG = timedelta(minutes=5)
+ROLLUP_DELAY = ROLLUP_LAG + timedelta(minutes=1)
+
+
+def low_stock_threshold():
+    return getattr(settings, 'LOW_STOCK_THRESHOLD', 5)
+
+
+@task('orders.send_order_confirmation')
+def send_order_confirmation(order_id):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    if order is None:
+        return
+    lines = '\n'.join(
+        f'{item.quantity} x {item.product_variant} @ {item.price}'
+        for item in order.items.select_related('product_variant__product')
+    )
+    send_mail(
+        f'Order confirmation {order.order_number}',
+        f'Thank you for your order {order.order_number}.\n\n{lines}\n\nTotal: {order.total_amount}',
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+        fail_silently=False,
+    )
+
+
+@task('orders.alert_low_stock')
+def alert_low_stock(variant_ids):
+    # Stock is read again here; a restock since checkout means no alert
+    variants = ProductVariant.objects.select_related('product').filter(
+        pk__in=variant_ids, stock_quantity__lt=low_stock_threshold()
+    ).order_by('pk')
+    lines = [f'{variant.sku} ({variant}): {variant.stock_quantity} left' for variant in variants]
+    if lines:
+        mail_admins('Low stock', '\n'.join(lines))
+
+
+@task('orders.record_trending')
+def record_trending(order_id):
+    # Claimed in the job's transaction: a failed attempt releases the claim, a finished one keeps it
+    if not Order.objects.filter(pk=order_id, trending_recorded=False).update(trending_recorded=True):
+        return
+    items = OrderItem.objects.filter(order_id=order_id).values_list(
+        'product_variant__product_id', 'quantity', 'order__created_at'
+    )
+    rows = list(items)
+    if rows:
+        trending.record_events('order', [(product_id, quantity) for product_id, quantity, _ in rows], at=rows[0][2])
+
+
+# rollups.run commits each window on its own; one transaction around it would hold the watermark lock throughout
+@task('orders.rollup_sales', atomic=False)
+def rollup_sales():
+    rollups.run(lag=ROLLUP_LAG)
+    # Orders placed while this job was pending were still inside the lag; run again once they are past it
+    if rollups.pending_orders().exists():
+        rollup_sales.enqueue(delay=ROLLUP_DELAY, unique=True)
+
+
+def enqueue_order_followups(order, low_stock_variant_ids=()):
+    """Queue the work that follows a checkout; call it inside the checkout transaction."""
+    send_order_confirmation.enqueue(order_id=order.pk)
+    record_trending.enqueue(order_id=order.pk)
+    if low_stock_variant_ids:
+        alert_low_stock.enqueue(variant_ids=sorted(low_stock_variant_ids))
+    # One pending rollup covers every checkout until it runs, once this order is past the lag.
+    # Concurrent checkouts may still queue one each; the watermark lock makes extra runs no-ops.
+    rollup_sales.enqueue(delay=ROLLUP_DELAY, unique=True)
@@ -0,0 +1,260 @@
+import csv
+import gzip
+import io
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from products.models import Category, Product, ProductTrendingScore, ProductVariant
+
+from . import rollups
+from .export import COLUMNS, export_orders
+from .models import Order, OrderItem, RollupWatermark, SalesRollup
+from .tasks import record_trending
+
+User = get_user_model()
+
+ADDRESS = {
+    'shipping_address': '1 Test Street',
+    'shipping_city': 'Test City',
+    'shipping_state': 'TS',
+    'shipping_zip': '00000',
+    'shipping_country': 'Testland',
+}
+
+
+class CheckoutStockMixin:
+    """Buyers with one low-stock variant in their carts."""
+
+    def make_variant(self, stock):
+        category = Category.objects.create(name='Checkout')
+        product = Product.objects.create(name='Checkout tee', description='Test', price=Decimal('10.00'), category=category)
+        return ProductVariant.objects.create(product=product, size='M', color='Black', sku='CHECKOUT-1', stock_quantity=stock)
+
+    def make_buyer(self, variant, quantity):
+        index = User.objects.count()
+        user = User.objects.create_user(username=f'buyer-{index}', email=f'buyer-{index}@example.com', password='unused')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product_variant=variant, quantity=quantity)
+        return user
+
+    def checkout(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/orders/create-from-cart/', ADDRESS, format='json')
+
+    def assert_not_oversold(self, variant, stock):
+        variant.refresh_from_db()
+        sold = sum(OrderItem.objects.filter(product_variant=variant).values_list('quantity', flat=True))
+        self.assertGreaterEqual(variant.stock_quantity, 0)
+        self.assertEqual(sold + variant.stock_quantity, stock)
+        return sold
+
+
+class CheckoutStockTests(CheckoutStockMixin, TestCase):
+    def test_checkout_beyond_stock_is_rejected(self):
+        variant = self.make_variant(stock=3)
+        first, second, third = (self.make_buyer(variant, quantity) for quantity in (2, 2, 1))
+
+        self.assertEqual(self.checkout(first).status_code, 201)
+        response = self.checkout(second)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient stock', response.data['error'])
+        self.assertEqual(self.checkout(third).status_code, 201)
+
+        self.assertEqual(self.assert_not_oversold(variant, 3), 3)
+        self.assertFalse(Order.objects.filter(user=second).exists())
+        self.assertEqual(Cart.objects.get(user=second).items.count(), 1)
+
+
+class RecordTrendingTests(CheckoutStockMixin, TestCase):
+    def test_a_rerun_does_not_count_the_order_twice(self):
+        variant = self.make_variant(stock=5)
+        self.assertEqual(self.checkout(self.make_buyer(variant, 2)).status_code, 201)
+        order = Order.objects.get()
+
+        record_trending(order_id=order.pk)
+        score = ProductTrendingScore.objects.get(product=variant.product_id).score
+        record_trending(order_id=order.pk)
+        self.assertEqual(ProductTrendingScore.objects.get(product=variant.product_id).score, score)
+        self.assertTrue(Order.objects.get().trending_recorded)
+
+
+class OrderListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def place_orders(self, user, count):
+        return [
+            Order.objects.create(user=user, subtotal=Decimal('10.00'), total_amount=Decimal('10.00'), **ADDRESS)
+            for _ in range(count)
+        ]
+
+    def test_orders_placed_in_the_same_instant_are_ordered_by_id(self):
+        user = User.objects.create_user(username='buyer', email='buyer@example.com', password='unused')
+        orders = self.place_orders(user, 5)
+        Order.objects.update(created_at=timezone.now())
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/orders/')
+        self.assertEqual([order['id'] for order in response.data['results']], [order.pk for order in reversed(orders)])
+
+    def test_staff_search_by_email_matches_the_normalized_address(self):
+        buyer = User.objects.create_user(username='buyer', email='Buyer@EXAMPLE.com', password='unused')
+        other = User.objects.create_user(username='other', email='other@example.com', password='unused')
+        self.place_orders(buyer, 2)
+        self.place_orders(other, 1)
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='unused', is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.get('/api/orders/staff/', {'q': 'Buyer@Example.COM'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({order['user_email'] for order in response.data['results']}, {'Buyer@example.com'})
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='unused')
+        category = Category.objects.create(name='Shirts')
+        self.product = Product.objects.create(name='Shirt', description='Test', price=Decimal('10.00'), category=category)
+        self.variant = ProductVariant.objects.create(product=self.product, size='M', color='Black', sku='ROLLUP-1', stock_quantity=50)
+        self.placed_at = timezone.now() - timedelta(hours=1)
+
+    def place_order(self, quantity, price='10.00'):
+        line = Decimal(price) * quantity
+        order = Order.objects.create(user=self.user, subtotal=line, total_amount=line, **ADDRESS)
+        OrderItem.objects.create(order=order, product_variant=self.variant, quantity=quantity, price=Decimal(price))
+        Order.objects.filter(pk=order.pk).update(created_at=self.placed_at)
+        return order
+
+    def totals(self, dimension='all'):
+        return list(
+            SalesRollup.objects.filter(dimension=dimension).order_by('day', 'key')
+            .values_list('key', 'orders', 'units', 'revenue')
+        )
+
+    def test_run_twice_is_a_no_op(self):
+        orders = [self.place_order(quantity) for quantity in (1, 2, 3)]
+        self.assertEqual(rollups.run(batch_size=2), 3)
+        expected = [('', 3, 6, Decimal('60.00'))]
+        self.assertEqual(self.totals(), expected)
+        self.assertEqual(self.totals('product'), [(str(self.product.pk), 3, 6, Decimal('60.00'))])
+        self.assertEqual(RollupWatermark.objects.get().last_order_id, orders[-1].pk)
+
+        self.assertEqual(rollups.run(batch_size=2), 0)
+        self.assertEqual(self.totals(), expected)
+
+    def test_orders_inside_the_lag_wait_for_a_later_run(self):
+        self.place_order(1)
+        recent = self.place_order(2)
+        Order.objects.filter(pk=recent.pk).update(created_at=timezone.now())
+        self.assertEqual(rollups.run(), 1)
+        self.assertTrue(rollups.pending_orders().exists())
+        Order.objects.filter(pk=recent.pk).update(created_at=self.placed_at)
+        self.assertEqual(rollups.run(), 1)
+        self.assertEqual(self.totals(), [('', 2, 3, Decimal('30.00'))])
+        self.assertFalse(rollups.pending_orders().exists())
+
+    def test_rebuild_drops_cancelled_orders(self):
+        self.place_order(1)
+        cancelled = self.place_order(4)
+        rollups.run()
+        self.assertEqual(self.totals(), [('', 2, 5, Decimal('50.00'))])
+
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+        self.assertEqual(rollups.rebuild(self.placed_at.date(), batch_size=1), 2)
+        self.assertEqual(self.totals(), [('', 1, 1, Decimal('10.00'))])
+        self.assertEqual(self.totals('brand'), [('', 1, 1, Decimal('10.00'))])
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='unused')
+        category = Category.objects.create(name='Shirts')
+        product = Product.objects.create(name='Shirt', description='Test', price=Decimal('10.00'), category=category)
+        self.variant = ProductVariant.objects.create(product=product, size='M', color='Black', sku='EXPORT-1', stock_quantity=50)
+
+    def place_order(self, *lines):
+        order = Order.objects.create(user=self.user, subtotal=Decimal('0.00'), total_amount=Decimal('0.00'), **ADDRESS)
+        for quantity, price in lines:
+            OrderItem.objects.create(order=order, product_variant=self.variant, quantity=quantity, price=Decimal(price))
+        return order
+
+    def read_rows(self, data):
+        with gzip.open(io.BytesIO(data), 'rt', encoding='utf-8', newline='') as handle:
+            return list(csv.reader(handle))
+
+    def test_chunked_csv_has_one_header_and_exact_amounts(self):
+        self.place_order((3, '19.99'), (1, '0.10'))
+        self.place_order((2, '5.05'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.csv.gz')
+            self.assertEqual(export_orders(path, chunk_size=2), 3)
+            with open(path, 'rb') as handle:
+                rows = self.read_rows(handle.read())
+
+        header = rows[0]
+        self.assertEqual(header, [name for name, _, _ in COLUMNS] + ['line_total'])
+        self.assertEqual(len(rows), 4)
+        lines = [dict(zip(header, row)) for row in rows[1:]]
+        self.assertEqual(
+            [(line['quantity'], line['unit_price'], line['line_total']) for line in lines],
+            [('3', '19.99', '59.97'), ('1', '0.10', '0.10'), ('2', '5.05', '10.10')],
+        )
+
+    def test_empty_export_writes_the_header(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.csv.gz')
+            self.assertEqual(export_orders(path), 0)
+            with open(path, 'rb') as handle:
+                self.assertEqual(len(self.read_rows(handle.read())), 1)
+
+    def test_staff_endpoint_streams_gzip_csv(self):
+        self.place_order((1, '12.50'))
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='unused', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.get('/api/orders/staff/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(dict(zip(rows[0], rows[1]))['line_total'], '12.50')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCheckoutTests(CheckoutStockMixin, TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def test_parallel_checkouts_never_oversell(self):
+        variant = self.make_variant(stock=self.stock)
+        users = [self.make_buyer(variant, 1) for _ in range(self.buyers)]
+        barrier = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(user):
+            try:
+                barrier.wait()
+                results.append(self.checkout(user).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sold = self.assert_not_oversold(variant, self.stock)
+        self.assertEqual(sold, results.count(201))
+        self.assertEqual(Order.objects.count(), results.count(201))
+        self.assertLessEqual(sold, self.stock)
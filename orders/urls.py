@@ -4,6 +4,10 @@ from . import views
 urlpatterns = [
     path('', views.OrderListCreateView.as_view(), name='order-list-create'),
     path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('staff/', views.StaffOrderListView.as_view(), name='staff-order-list'),
+    path('staff/dashboard/', views.staff_order_dashboard, name='staff-order-dashboard'),
+    path('staff/export/', views.staff_order_export, name='staff-order-export'),
+    path('staff/sales/', views.sales_report, name='sales-report'),
     path('create-from-cart/', views.create_order_from_cart, name='create-order-from-cart'),
     path('<int:order_id>/update-status/', views.update_order_status, name='update-order-status'),
     path('<int:order_id>/tracking/', views.order_tracking, name='order-tracking'),
@@ -1,22 +1,145 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from django.contrib.auth.base_user import BaseUserManager
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from decimal import Decimal
-from .models import Order, OrderItem, DiscountCode
-from .serializers import OrderSerializer, OrderCreateSerializer, DiscountCodeSerializer
-from cart.models import Cart, CartItem
+from django.db.models import Count, F, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from fashion_store.pagination import KeysetPagination
+from .models import Order, OrderItem, DiscountCode, RollupWatermark, SalesRollup
+from .export import csv_chunks, gzip_stream, iter_frames
+from .rollups import WATERMARK_NAME
+from .serializers import OrderSerializer, OrderCreateSerializer, OrderSummarySerializer, DiscountCodeSerializer
+from .tasks import enqueue_order_followups, low_stock_threshold
+from cart.models import Cart, CartItem, discount_rule
+from products import pricing
+from products.coupons import redeem
+from products.models import ProductImage, ProductVariant
+from products.serializers import primary_image_prefetch
+
+
+def order_items_prefetch():
+    """Items with their variant and product in one query, plus one query for primary images."""
+    return (
+        Prefetch('items', OrderItem.objects.select_related('product_variant__product').order_by('id')),
+        primary_image_prefetch('items__product_variant__product__images'),
+    )
+
+
+def with_order_summary(queryset):
+    """
+    Annotate item_count, total_quantity and the first item's primary image.
+
+    Correlated subqueries rather than a join with GROUP BY, so they run only
+    for the rows of the page and the order index can still satisfy LIMIT.
+    """
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    # Nested one level deeper, inside the image subquery
+    first_product = OrderItem.objects.filter(
+        order=OuterRef(OuterRef('pk'))
+    ).order_by('id').values('product_variant__product_id')[:1]
+    thumbnail = ProductImage.objects.filter(product_id=Subquery(first_product), is_primary=True).values('image')[:1]
+    return queryset.select_related('user').annotate(
+        item_count=Coalesce(Subquery(items.annotate(total=Count('id')).values('total')), 0),
+        total_quantity=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        thumbnail=Subquery(thumbnail),
+    )
+
+
+def staff_order_filters(params):
+    """
+    Filters for the staff order views, each one matching a composite index.
+
+    ``status`` and ``payment_status`` use (<field>, created_at, id), ``user``
+    uses (user, created_at, id); ``created_from`` / ``created_to`` (ISO
+    dates, inclusive) bound created_at. ``q`` is an order-number prefix, or
+    an exact email when it contains '@'. Raises ValueError on bad input.
+    """
+    filters = Q()
+    for field in ('status', 'payment_status'):
+        if params.get(field):
+            filters &= Q(**{field: params[field]})
+    if params.get('user'):
+        if not params['user'].isdigit():
+            raise ValueError('user must be an integer')
+        filters &= Q(user_id=int(params['user']))
+    for param, lookup, offset in (('created_from', 'gte', 0), ('created_to', 'lt', 1)):
+        if params.get(param):
+            day = parse_date(params[param])
+            if day is None:
+                raise ValueError(f'{param} must be a date (YYYY-MM-DD)')
+            start = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+            filters &= Q(**{f'created_at__{lookup}': start})
+    q = params.get('q', '').strip()
+    if q:
+        # Exact matches use the unique email index; iexact would compare UPPER() and scan
+        filters &= Q(user__email=BaseUserManager.normalize_email(q)) if '@' in q else Q(order_number__startswith=q.upper())
+    return filters
+
+
+class StaffOrderListView(generics.ListAPIView):
+    """All orders for staff: indexed filters and keyset pagination on (created_at, id)."""
+    serializer_class = OrderSummarySerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        try:
+            filters = staff_order_filters(self.request.query_params)
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+        return with_order_summary(Order.objects.filter(filters))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def staff_order_dashboard(request):
+    """Order counts per status and payment status, plus revenue, for the staff filters (one query)"""
+    # Counting per status makes the status filters themselves moot
+    params = {key: value for key, value in request.query_params.items() if key not in ('status', 'payment_status')}
+    try:
+        filters = staff_order_filters(params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    aggregates = {'total': Count('pk'), 'revenue': Coalesce(Sum('total_amount'), Decimal('0.00'))}
+    for code, _ in Order.STATUS_CHOICES:
+        aggregates[f'status__{code}'] = Count('pk', filter=Q(status=code))
+    for code, _ in Order.PAYMENT_STATUS_CHOICES:
+        aggregates[f'payment__{code}'] = Count('pk', filter=Q(payment_status=code))
+    totals = Order.objects.filter(filters).aggregate(**aggregates)
+
+    return Response({
+        'total_orders': totals['total'],
+        'revenue': float(totals['revenue']),
+        'status_counts': {code: totals[f'status__{code}'] for code, _ in Order.STATUS_CHOICES},
+        'payment_status_counts': {code: totals[f'payment__{code}'] for code, _ in Order.PAYMENT_STATUS_CHOICES},
+    })
+
 
 class OrderListCreateView(generics.ListCreateAPIView):
-    serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return OrderSummarySerializer
+        return OrderSerializer
+
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return Order.objects.all().select_related('user').prefetch_related('items')
-        return Order.objects.filter(user=self.request.user).select_related('user').prefetch_related('items')
+        orders = Order.objects.all() if self.request.user.is_staff else Order.objects.filter(user=self.request.user)
+        if self.request.method == 'GET':
+            # id breaks ties between orders placed in the same instant, so pages are stable
+            return with_order_summary(orders).order_by('-created_at', '-id')
+        return orders.select_related('user').prefetch_related(*order_items_prefetch())
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -30,8 +153,8 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+            return Order.objects.all().select_related('user').prefetch_related(*order_items_prefetch())
+        return Order.objects.filter(user=self.request.user).select_related('user').prefetch_related(*order_items_prefetch())
 
 
 @api_view(['DELETE'])
@@ -55,38 +178,32 @@ def create_order_from_cart(request):
 
     try:
         cart = Cart.objects.get(user=request.user)
-        cart_items = cart.items.all()
-        
-        if not cart_items.exists():
+        cart_items = list(cart.items.select_related('product_variant__product').order_by('product_variant_id'))
+
+        if not cart_items:
             return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
-            # Calculate totals
-            subtotal = sum(item.total_price for item in cart_items)
-            tax_rate = Decimal('0.08')  # 8% tax rate
-            tax_amount = subtotal * tax_rate
-            shipping_cost = Decimal('0.00') if subtotal >= Decimal('100.00') else Decimal('10.00')  # Free shipping over $100
-            
-            # Use cart's discount information
-            discount_amount = cart.discount_amount or Decimal('0.00')
-            discount_code = cart.discount_code
-            
-            # If discount code is provided in request, validate and apply it
-            if serializer.validated_data.get('discount_code') and not discount_code:
-                try:
-                    discount = DiscountCode.objects.get(code=serializer.validated_data['discount_code'])
-                    if discount.is_valid() and subtotal >= discount.minimum_order_amount:
-                        if discount.discount_type == 'percentage':
-                            discount_amount = (subtotal * discount.discount_value) / Decimal('100')
-                        else:
-                            discount_amount = Decimal(discount.discount_value)
-                        discount_code = discount.code
-                        discount.used_count += 1
-                        discount.save()
-                except DiscountCode.DoesNotExist:
-                    pass
-            
-            total_amount = subtotal + tax_amount + shipping_cost - discount_amount
+            # Lock all variants in one query, in pk order so concurrent checkouts cannot deadlock
+            variants = ProductVariant.objects.select_for_update().filter(
+                pk__in=[item.product_variant_id for item in cart_items]
+            ).order_by('pk').in_bulk()
+            for cart_item in cart_items:
+                variant = variants.get(cart_item.product_variant_id)
+                if variant is None or variant.stock_quantity < cart_item.quantity:
+                    raise Exception(f'Insufficient stock for {cart_item.product_variant}')
+
+            # Price the cart with its applied code, or else the code sent with the request
+            lines = [(item.product_variant, item.quantity) for item in cart_items]
+            rule = discount_rule(cart.discount_code or serializer.validated_data.get('discount_code'))
+            quote = pricing.quote(lines, [rule] if rule else [])
+
+            # Only discount the order if a use of the code could still be claimed
+            redemption = None
+            if quote.discounts:
+                redemption = redeem(rule, request.user, quote.discount_amount)
+                if redemption is None:
+                    quote = pricing.quote(lines)
 
             # Create order
             order_data = {
@@ -101,34 +218,47 @@ def create_order_from_cart(request):
                 'billing_state': serializer.validated_data.get('billing_state', ''),
                 'billing_zip': serializer.validated_data.get('billing_zip', ''),
                 'billing_country': serializer.validated_data.get('billing_country', ''),
-                'subtotal': subtotal,
-                'tax_amount': tax_amount,
-                'shipping_cost': shipping_cost,
-                'discount_amount': discount_amount,
-                'total_amount': total_amount,
+                'subtotal': quote.subtotal,
+                'tax_amount': quote.tax_amount,
+                'shipping_cost': quote.shipping_cost,
+                'discount_amount': quote.discount_amount,
+                'total_amount': quote.total,
                 'notes': serializer.validated_data.get('notes', ''),
             }
             
             order = Order.objects.create(**order_data)
+            if redemption is not None:
+                redemption.order = order
+                redemption.save(update_fields=['order'])
 
             # Create order items and update stock
-            for cart_item in cart_items:
-                if cart_item.product_variant.stock_quantity < cart_item.quantity:
-                    raise Exception(f'Insufficient stock for {cart_item.product_variant}')
-                
-                OrderItem.objects.create(
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
-                    product_variant=cart_item.product_variant,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product_variant.product.price
+                    product_variant_id=line.variant_id,
+                    quantity=line.quantity,
+                    price=line.unit_price
                 )
-                
-                # Update stock
-                cart_item.product_variant.stock_quantity -= cart_item.quantity
-                cart_item.product_variant.save()
+                for line in quote.lines
+            ])
+            for cart_item in cart_items:
+                # Conditional decrement: stock never goes negative, even where row locks are unsupported
+                updated = ProductVariant.objects.filter(
+                    pk=cart_item.product_variant_id, stock_quantity__gte=cart_item.quantity
+                ).update(stock_quantity=F('stock_quantity') - cart_item.quantity)
+                if not updated:
+                    raise Exception(f'Insufficient stock for {cart_item.product_variant}')
+
+            # Emails, alerts and analytics run in the job worker once this commits
+            enqueue_order_followups(order, low_stock_variant_ids=[
+                cart_item.product_variant_id for cart_item in cart_items
+                if variants[cart_item.product_variant_id].stock_quantity - cart_item.quantity < low_stock_threshold()
+            ])
 
-            # Clear cart
+            # Clear cart; its discount code has been used by this order
             cart.items.all().delete()
+            Cart.objects.filter(pk=cart.pk).update(discount_code=None, discount_amount=0)
+            Cart.refresh_totals([cart.pk])
 
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
@@ -163,10 +293,11 @@ def update_order_status(request, order_id):
 def order_tracking(request, order_id):
     """Get order tracking information"""
     try:
+        orders = Order.objects.select_related('user').prefetch_related(*order_items_prefetch())
         if request.user.is_staff:
-            order = Order.objects.get(id=order_id)
+            order = orders.get(id=order_id)
         else:
-            order = Order.objects.get(id=order_id, user=request.user)
+            order = orders.get(id=order_id, user=request.user)
         
         return Response(OrderSerializer(order).data)
     except Order.DoesNotExist:
@@ -183,3 +314,72 @@ class DiscountCodeDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = DiscountCode.objects.all()
     serializer_class = DiscountCodeSerializer
     permission_classes = [IsAdminUser]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def staff_order_export(request):
+    """Order lines matching the staff filters as a streamed gzip CSV (staff only)"""
+    try:
+        orders = Order.objects.filter(staff_order_filters(request.query_params))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(gzip_stream(csv_chunks(iter_frames(orders))), content_type='application/gzip')
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.now():%Y%m%d-%H%M%S}.csv.gz"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+SALES_REPORT_ORDERINGS = ('revenue', 'units', 'orders')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report(request):
+    """
+    Sales totals from the daily rollups (staff only).
+
+    ?dimension= all|product|category|brand|gender, ?from= / ?to= dates
+    (default: the last 30 days), ?order_by= revenue|units|orders and
+    ?limit=. With ?daily=1 the totals are per day instead of per key, for
+    one ?key= or the whole dimension.
+    """
+    dimension = request.GET.get('dimension', 'all')
+    if dimension not in dict(SalesRollup.DIMENSION_CHOICES):
+        return Response({'error': 'Invalid dimension'}, status=status.HTTP_400_BAD_REQUEST)
+    order_by = request.GET.get('order_by', 'revenue')
+    if order_by not in SALES_REPORT_ORDERINGS:
+        return Response({'error': 'Invalid order_by'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 500)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    today = timezone.now().date()
+    date_to = parse_date(request.GET['to']) if request.GET.get('to') else today
+    date_from = parse_date(request.GET['from']) if request.GET.get('from') else today - timedelta(days=29)
+    if date_from is None or date_to is None:
+        return Response({'error': 'from and to must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rollups = SalesRollup.objects.filter(dimension=dimension, day__gte=date_from, day__lte=date_to)
+    totals = {'orders': Sum('orders'), 'units': Sum('units'), 'revenue': Sum('revenue'),
+              'discount': Sum('discount'), 'tax': Sum('tax')}
+    if request.GET.get('daily') in ('1', 'true'):
+        if request.GET.get('key'):
+            rollups = rollups.filter(key=request.GET['key'])
+        rows = rollups.values('day').annotate(**totals).order_by('day')
+    else:
+        rows = rollups.values('key').annotate(label=Max('label'), **totals).order_by(f'-{order_by}', 'key')[:limit]
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values('last_order_id', 'updated_at').first()
+    return Response({
+        'dimension': dimension,
+        'from': date_from,
+        'to': date_to,
+        'rolled_up_through': watermark,
+        'results': [
+            {**row, **{field: float(row[field]) for field in ('revenue', 'discount', 'tax')}}
+            for row in rows
+        ],
+    })
@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Category, Product, ProductImage, ProductVariant, ProductReview, Wishlist
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from . import repricing
+from .models import Category, CouponRedemption, PriceSnapshot, Product, ProductImage, ProductVariant, ProductReview, Wishlist
 
 
 class ProductImageInline(admin.TabularInline):
@@ -19,13 +22,42 @@ class CategoryAdmin(admin.ModelAdmin):
     ordering = ('name',)
 
 
+class RepricingActionForm(ActionForm):
+    reprice_mode = forms.ChoiceField(choices=[('percentage', '% change'), ('fixed', 'Amount change')], required=False)
+    reprice_value = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+    original_price = forms.ChoiceField(choices=[(policy, f'Original price: {policy}') for policy in repricing.ORIGINAL_PRICE_POLICIES], required=False)
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'category', 'gender', 'brand', 'is_active', 'created_at')
+    list_display = ('name', 'price', 'category', 'gender', 'brand', 'review_count', 'is_active', 'created_at')
     list_filter = ('category', 'gender', 'brand', 'is_active', 'created_at')
     search_fields = ('name', 'description', 'brand')
     ordering = ('-created_at',)
+    readonly_fields = Product.RATING_SUMMARY_FIELDS
     inlines = [ProductImageInline, ProductVariantInline]
+    action_form = RepricingActionForm
+    actions = ['reprice_selected']
+
+    @admin.action(description='Reprice selected products')
+    def reprice_selected(self, request, queryset):
+        form = RepricingActionForm(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid() or form.cleaned_data['reprice_value'] is None:
+            self.message_user(request, 'Enter a price change to apply.', messages.ERROR)
+            return
+        mode = form.cleaned_data['reprice_mode'] or 'percentage'
+        value = form.cleaned_data['reprice_value']
+        plan = repricing.plan(queryset, mode, value, original_price=form.cleaned_data['original_price'] or 'keep')
+        if not repricing.change_count(plan):
+            self.message_user(request, 'No prices changed.', messages.WARNING)
+            return
+        snapshot = repricing.apply(plan, description=f'Admin: {mode} {value}', user=request.user)
+        self.message_user(
+            request,
+            f'Repriced {snapshot.product_count} products and {len(plan.variant_ids)} variant prices. '
+            f'Roll back with price snapshot {snapshot.pk}.'
+        )
 
 
 @admin.register(ProductImage)
@@ -57,3 +89,32 @@ class WishlistAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('user__email', 'product__name')
     ordering = ('-created_at',)
+
+
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ('code', 'coupon_type', 'user', 'order', 'discount_amount', 'created_at')
+    list_filter = ('coupon_type', 'created_at')
+    search_fields = ('code', 'user__email', 'order__order_number')
+    ordering = ('-created_at',)
+    readonly_fields = ('coupon_type', 'coupon_id', 'code', 'user', 'order', 'discount_amount', 'created_at')
+
+
+@admin.register(PriceSnapshot)
+class PriceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'description', 'product_count', 'created_by', 'created_at', 'rolled_back_at')
+    list_filter = ('created_at',)
+    ordering = ('-created_at',)
+    exclude = ('entries', 'variant_entries')
+    readonly_fields = ('description', 'created_by', 'product_count', 'created_at', 'rolled_back_at')
+    actions = ['roll_back']
+
+    @admin.action(description='Roll back selected snapshots (newest first)')
+    def roll_back(self, request, queryset):
+        for snapshot in queryset.order_by('-pk'):
+            try:
+                repricing.rollback(snapshot)
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return
+            self.message_user(request, f'Restored {snapshot.product_count} products from snapshot {snapshot.pk}.')
@@ -0,0 +1,99 @@
+"""
+Conditional GET (ETag / Last-Modified) for the product and category APIs.
+
+Validators are computed from the database alone, without serializing the
+body, so every worker process derives the same ones: one aggregate over
+the indexed Product.updated_at and Category.updated_at, plus row counts so
+deletions change the ETag too. Saving or deleting a product's variant,
+image or review touches the product's updated_at (see products.signals).
+Product detail adds the total stock of its variants, because a checkout
+decrements stock with a plain UPDATE.
+
+Responses carry ``Cache-Control: no-cache`` so browsers keep the body but
+revalidate every time, turning repeat fetches into 304s.
+"""
+from functools import wraps
+
+from datetime import datetime
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Category, Product
+
+
+def product_list_state(request, *args, **kwargs):
+    # Every product has a category, so one join covers both tables
+    return Category.objects.aggregate(
+        category_count=Count('id', distinct=True),
+        category_updated=Max('updated_at'),
+        product_count=Count('products'),
+        updated=Max('products__updated_at'),
+    )
+
+
+def product_detail_state(request, pk, *args, **kwargs):
+    return Product.objects.filter(pk=pk).aggregate(
+        updated=Max('updated_at'),
+        category_updated=Max('category__updated_at'),
+        stock=Sum('variants__stock_quantity'),
+    )
+
+
+def category_state(request, *args, **kwargs):
+    return Category.objects.aggregate(category_count=Count('id'), updated=Max('updated_at'))
+
+
+def _etag_part(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000000)
+    return 0 if value is None else value
+
+
+def _validators(request, state, args, kwargs):
+    """
+    (etag, last_modified) for the request, computed once and shared by both
+    callbacks. The ETag is also left on ``request.catalog_etag`` for the
+    response cache key.
+    """
+    validators = getattr(request, '_catalog_validators', None)
+    if validators is None:
+        values = state(request, *args, **kwargs)
+        timestamps = [value for value in values.values() if isinstance(value, datetime)]
+        etag = '-'.join(str(_etag_part(values[name])) for name in sorted(values))
+        validators = (etag, max(timestamps) if timestamps else None)
+        request._catalog_validators = validators
+        request.catalog_etag = validators[0]
+    return validators
+
+
+def catalog_condition(state):
+    """
+    Answer GETs with 304 when the client's validators still match.
+
+    ``state`` returns a dict of database values; all of them make up the
+    ETag and the latest datetime among them is Last-Modified. Apply it
+    below ``@api_view`` so authentication and permissions run first.
+    """
+    def etag(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return _validators(request, state, args, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return _validators(request, state, args, kwargs)[1]
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
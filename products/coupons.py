@@ -0,0 +1,153 @@
+"""
+Coupon rule lookup and redemption.
+
+Validation reads immutable CouponRule snapshots from an in-process cache
+keyed by model and normalized code, so checking a code as the user types
+is a dictionary lookup. An entry expires after COUPON_CACHE_TTL seconds
+(COUPON_CACHE_MISS_TTL for unknown codes), or earlier when the coupon's
+validity window opens or closes. Coupon saves and deletes clear the cache
+of the process that made them (see products.signals); other processes
+catch up through the TTL.
+
+Only redemption touches the database: a use is claimed with one conditional UPDATE that increments ``used_count``
+only while the coupon is active, inside its validity window and under its
+usage limit, so concurrent redemptions can neither lose increments nor
+exceed the limit. Each claimed use is recorded in CouponRedemption.
+"""
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import pricing
+from .models import CouponRedemption
+
+MAX_ENTRIES = 10000
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+class CouponRule(namedtuple('CouponRule', [
+    'model', 'pk', 'code', 'description', 'discount_type', 'discount_value',
+    'minimum_order_amount', 'maximum_discount_amount', 'minimum_quantity', 'product_id',
+    'usage_limit', 'used_count', 'is_active', 'valid_from', 'valid_until',
+])):
+    """Snapshot of a ProductDiscount, GlobalDiscountCoupon or DiscountCode. ``used_count`` may lag."""
+    __slots__ = ()
+
+    @classmethod
+    def from_instance(cls, coupon):
+        model = type(coupon)
+        return cls(
+            model=model,
+            pk=coupon.pk,
+            code=coupon.code,
+            description=coupon.description,
+            discount_type=coupon.discount_type,
+            discount_value=coupon.discount_value,
+            minimum_order_amount=getattr(coupon, 'minimum_order_amount', Decimal('0')),
+            maximum_discount_amount=getattr(coupon, 'maximum_discount_amount', None),
+            minimum_quantity=getattr(coupon, 'minimum_quantity', 1),
+            product_id=getattr(coupon, 'product_id', None),
+            usage_limit=getattr(coupon, getattr(model, 'USAGE_LIMIT_FIELD', 'maximum_uses')),
+            used_count=coupon.used_count,
+            is_active=coupon.is_active,
+            valid_from=coupon.valid_from,
+            valid_until=coupon.valid_until,
+        )
+
+    def is_valid(self, now=None):
+        now = now or timezone.now()
+        return (
+            self.is_active and
+            self.valid_from <= now <= self.valid_until and
+            (self.usage_limit is None or self.used_count < self.usage_limit)
+        )
+
+    def can_be_used(self, quantity=1):
+        return self.is_valid() and quantity >= self.minimum_quantity
+
+    def calculate_discount(self, order_amount):
+        if not self.is_valid():
+            return 0
+        return pricing.coupon_discount(self, order_amount)
+
+
+class CouponRuleCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _expires_at(self, rule):
+        ttl = getattr(settings, 'COUPON_CACHE_TTL', 300)
+        if rule is None:
+            return time.monotonic() + getattr(settings, 'COUPON_CACHE_MISS_TTL', 30)
+        now = timezone.now()
+        # Drop the entry when the coupon becomes valid or expires so is_valid() never lags the window
+        for boundary in (rule.valid_from, rule.valid_until):
+            if boundary > now:
+                ttl = min(ttl, (boundary - now).total_seconds())
+        return time.monotonic() + ttl
+
+    def get(self, model, code):
+        """The CouponRule for ``code`` (case-insensitive), or None if no such coupon exists."""
+        code = normalize_code(code)
+        if not code:
+            return None
+        key = (model._meta.label_lower, code)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        # Codes are usually stored upper-cased, which the unique index on code answers. Codes saved
+        # in another case (DiscountCode stores them as typed) fall back to a case-insensitive scan.
+        coupon = (
+            model.objects.filter(code=code).first()
+            or model.objects.filter(code__iexact=code).order_by('pk').first()
+        )
+        rule = CouponRule.from_instance(coupon) if coupon is not None else None
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[key] = (rule, self._expires_at(rule))
+        return rule
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+coupon_rules = CouponRuleCache()
+
+
+def redeem(coupon, user=None, discount_amount=Decimal('0'), order=None):
+    """
+    Claim one use of ``coupon`` (a model instance or CouponRule).
+
+    Returns the CouponRedemption, or None if the coupon is used up or expired.
+    """
+    model = coupon.model if isinstance(coupon, CouponRule) else type(coupon)
+    limit_field = getattr(model, 'USAGE_LIMIT_FIELD', 'maximum_uses')
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = model.objects.filter(
+            Q(**{f'{limit_field}__isnull': True}) | Q(**{f'{limit_field}__gt': F('used_count')}),
+            pk=coupon.pk, is_active=True, valid_from__lte=now, valid_until__gte=now,
+        ).update(used_count=F('used_count') + 1)
+        if not claimed:
+            return None
+        return CouponRedemption.objects.create(
+            coupon_type=model._meta.label_lower,
+            coupon_id=coupon.pk,
+            code=coupon.code,
+            user=user if user is not None and user.is_authenticated else None,
+            order=order,
+            discount_amount=discount_amount,
+        )
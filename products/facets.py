@@ -0,0 +1,244 @@
+"""
+Facet counts for the product listing, computed from in-memory bitmaps.
+
+Active products are numbered densely in price order, so every facet value
+(brand, gender, category, size, color, accessory type) is a Python int
+bitmap over those positions and any price range is a contiguous run of
+bits. A filtered listing's facet counts are then a handful of ANDs and
+popcounts per value instead of one GROUP BY query per facet.
+
+Counts for each facet are computed with every filter applied except that
+facet's own, so the UI can show the alternatives to the current choice.
+The index is rebuilt lazily: on first use, after FACET_INDEX_TTL seconds,
+or once a catalog change has marked it stale and FACET_INDEX_MIN_AGE
+seconds have passed since the last build.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from .models import Product, ProductVariant
+
+GENDER_CODES = {
+    'Men': 'M', 'Women': 'W', 'Kids': 'K', 'Unisex': 'U',
+    'M': 'M', 'W': 'W', 'K': 'K', 'U': 'U'
+}
+
+PRICE_BUCKETS = [
+    (Decimal('0'), Decimal('25')),
+    (Decimal('25'), Decimal('50')),
+    (Decimal('50'), Decimal('100')),
+    (Decimal('100'), Decimal('200')),
+    (Decimal('200'), None),
+]
+
+
+def _popcount(value):
+    return bin(value).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count  # noqa: F811
+
+
+def _bitmap(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _range_mask(start, stop):
+    if stop <= start:
+        return 0
+    return ((1 << (stop - start)) - 1) << start
+
+
+def _decimal(value):
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._stale = False
+        self.size = 0
+        self.position_of = {}
+        self.prices = []
+        self.postings = {}
+        self.labels = {}
+
+    def mark_stale(self):
+        self._stale = True
+
+    def rebuild(self):
+        products = (
+            Product.objects.filter(is_active=True)
+            .order_by('price', 'id')
+            .values_list('id', 'price', 'gender', 'brand', 'category_id', 'category__name', 'is_accessory', 'accessory_type')
+        )
+        variants = ProductVariant.objects.filter(product__is_active=True).values_list('product_id', 'size', 'color')
+
+        prices = []
+        position_of = {}
+        positions = {facet: defaultdict(list) for facet in ('gender', 'brand', 'category', 'accessory_type')}
+        labels = {'gender': dict(Product.GENDER_CHOICES), 'brand': {}, 'category': {}, 'size': {}, 'color': {}}
+
+        for pos, (product_id, price, gender, brand, category_id, category_name, is_accessory, accessory_type) in enumerate(products.iterator()):
+            prices.append(price)
+            position_of[product_id] = pos
+            positions['gender'][gender].append(pos)
+            positions['category'][category_id].append(pos)
+            labels['category'][category_id] = category_name
+            if brand:
+                positions['brand'][brand.lower()].append(pos)
+                labels['brand'].setdefault(brand.lower(), brand)
+            if is_accessory and accessory_type:
+                positions['accessory_type'][accessory_type].append(pos)
+
+        variant_positions = {'size': defaultdict(set), 'color': defaultdict(set)}
+        for product_id, size, color in variants.iterator():
+            pos = position_of.get(product_id)
+            if pos is None:
+                continue
+            variant_positions['size'][size].add(pos)
+            labels['size'].setdefault(size, size)
+            variant_positions['color'][color.lower()].add(pos)
+            labels['color'].setdefault(color.lower(), color)
+
+        size = len(prices)
+        postings = {
+            facet: {value: _bitmap(found, size) for value, found in values.items()}
+            for facet, values in list(positions.items()) + list(variant_positions.items())
+        }
+
+        with self._lock:
+            self.size = size
+            self.position_of = position_of
+            self.prices = prices
+            self.postings = postings
+            self.labels = labels
+            self._built_at = time.monotonic()
+            self._stale = False
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            self.rebuild()
+            return
+        age = time.monotonic() - self._built_at
+        if age > getattr(settings, 'FACET_INDEX_TTL', 300) or (
+            self._stale and age > getattr(settings, 'FACET_INDEX_MIN_AGE', 30)
+        ):
+            self.rebuild()
+
+    def _price_mask(self, min_price, max_price):
+        start = bisect_left(self.prices, min_price) if min_price is not None else 0
+        stop = bisect_right(self.prices, max_price) if max_price is not None else self.size
+        return _range_mask(start, stop)
+
+    def _any_of(self, facet, predicate):
+        mask = 0
+        for value, bitmap in self.postings.get(facet, {}).items():
+            if predicate(value):
+                mask |= bitmap
+        return mask
+
+    def bitmap_for_ids(self, product_ids):
+        position_of = self.position_of
+        return _bitmap((position_of[pk] for pk in product_ids if pk in position_of), self.size)
+
+    def selections(self, params):
+        """Map each active filter in ``params`` to the bitmap of products it allows."""
+        selected = {}
+
+        gender = params.get('gender') or params.get('category')
+        if gender:
+            selected['gender'] = self.postings['gender'].get(GENDER_CODES.get(gender, gender), 0)
+
+        accessory_type = params.get('accessory_type')
+        if accessory_type:
+            selected['accessory_type'] = self.postings['accessory_type'].get(accessory_type, 0)
+
+        brand = params.get('brand')
+        if brand:
+            selected['brand'] = self.postings['brand'].get(brand.lower(), 0)
+
+        category_name = params.get('category__name')
+        if category_name:
+            selected['category'] = self._any_of(
+                'category', lambda category_id: self.labels['category'].get(category_id) == category_name
+            )
+
+        size = params.get('size')
+        if size:
+            selected['size'] = self.postings['size'].get(size, 0)
+
+        color = params.get('color')
+        if color:
+            color = color.lower()
+            selected['color'] = self._any_of('color', lambda value: color in value)
+
+        min_price = _decimal(params.get('min_price') or params.get('price__gte'))
+        max_price = _decimal(params.get('max_price') or params.get('price__lte'))
+        if min_price is not None or max_price is not None:
+            selected['price'] = self._price_mask(min_price, max_price)
+
+        return selected
+
+    def facet_counts(self, params, restrict_to_ids=None):
+        """
+        Facet counts for the listing filtered by ``params``.
+
+        ``restrict_to_ids`` limits counting to the given product ids, e.g. the
+        matches of a text search, which the bitmaps do not cover.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            everything = _range_mask(0, self.size)
+            if restrict_to_ids is not None:
+                everything &= self.bitmap_for_ids(restrict_to_ids)
+            selected = self.selections(params)
+
+            def base_without(facet):
+                mask = everything
+                for name, bitmap in selected.items():
+                    if name != facet:
+                        mask &= bitmap
+                return mask
+
+            facets = {}
+            for facet in ('gender', 'category', 'brand', 'size', 'color'):
+                base = base_without(facet)
+                counts = []
+                for value, bitmap in self.postings.get(facet, {}).items():
+                    count = _popcount(base & bitmap)
+                    if count:
+                        counts.append({'value': value, 'label': self.labels[facet].get(value, value), 'count': count})
+                counts.sort(key=lambda item: (-item['count'], str(item['label'])))
+                facets[facet] = counts
+
+            base = base_without('price')
+            facets['price'] = []
+            for low, high in PRICE_BUCKETS:
+                start = bisect_left(self.prices, low)
+                stop = bisect_left(self.prices, high) if high is not None else self.size
+                count = _popcount(base & _range_mask(start, stop))
+                facets['price'].append({
+                    'min': float(low),
+                    'max': float(high) if high is not None else None,
+                    'count': count,
+                })
+
+            facets['total'] = _popcount(base_without(None))
+            return facets
+
+
+facet_index = FacetIndex()
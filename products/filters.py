@@ -0,0 +1,23 @@
+from django.db.models import Exists, OuterRef
+
+from .models import ProductVariant
+
+
+def filter_by_variants(queryset, size=None, color=None):
+    """
+    Restrict a Product queryset to products having a matching variant.
+
+    Each condition is an EXISTS subquery rather than a join on variants, so
+    products are never duplicated and the queryset needs no DISTINCT. As
+    with chained filters on a reverse relation, size and color may be
+    satisfied by different variants of the same product.
+    """
+    if size:
+        queryset = queryset.filter(
+            Exists(ProductVariant.objects.filter(product=OuterRef('pk'), size=size))
+        )
+    if color:
+        queryset = queryset.filter(
+            Exists(ProductVariant.objects.filter(product=OuterRef('pk'), color__icontains=color))
+        )
+    return queryset
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products import pricing
+from products.coupons import CouponRule
+from products.models import GlobalDiscountCoupon, Product, ProductVariant
+
+CART_SIZES = [1, 20, 200, 2000]
+
+
+class Command(BaseCommand):
+    help = 'Measure pricing.quote() throughput on in-memory carts with two stacked coupons (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=1.0, help='Time spent per cart size')
+
+    def handle(self, *args, **options):
+        coupons = self.coupons()
+        for size in CART_SIZES:
+            lines = self.cart(size)
+            quotes, elapsed = 0, 0.0
+            start = time.perf_counter()
+            while elapsed < options['seconds']:
+                pricing.quote(lines, coupons)
+                quotes += 1
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{size} lines: {quotes / elapsed:,.0f} quotes/s, {quotes * size / elapsed:,.0f} lines/s, '
+                f'{elapsed / quotes * 1e6:,.1f}us per quote'
+            )
+
+    def cart(self, size):
+        lines = []
+        for i in range(size):
+            product = Product(pk=i + 1, name=f'Product {i}', price=Decimal(10 + i % 90))
+            variant = ProductVariant(pk=i + 1, product=product, size='M', color='Black', sku=f'SKU-{i}')
+            # Every third variant overrides the product price
+            if i % 3 == 0:
+                variant.price = product.price + Decimal('2.50')
+            lines.append((variant, 1 + i % 3))
+        return lines
+
+    def coupons(self):
+        now = timezone.now()
+        return [
+            CouponRule.from_instance(GlobalDiscountCoupon(
+                pk=pk, code=code, description='', discount_type=discount_type, discount_value=Decimal(value),
+                minimum_order_amount=Decimal('0'), maximum_discount_amount=None, maximum_uses=None, used_count=0,
+                is_active=True, valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1),
+            ))
+            for pk, code, discount_type, value in [(1, 'TENOFF', 'percentage', '10'), (2, 'FIVE', 'fixed', '5')]
+        ]
@@ -0,0 +1,107 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.filters import filter_by_variants
+from products.models import Category, Product, ProductVariant
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', '28', '30', '32', '34', '36']
+COLORS = ['Black', 'White', 'Navy Blue', 'Sky Blue', 'Red', 'Green', 'Grey', 'Beige', 'Brown', 'Pink']
+
+CASES = [
+    {'size': 'M'},
+    {'color': 'blue'},
+    {'size': 'XS', 'color': 'red'},
+    {'size': '32', 'color': 'grey', 'gender': 'M'},
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare join+DISTINCT and EXISTS variant filters on a seeded catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--variants-per-product', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['products'], options['variants_per_product'])
+            for case in CASES:
+                self.compare(case, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, product_count, variants_per_product):
+        self.stdout.write(f'Seeding {product_count} products x {variants_per_product} variants...')
+        category = Category.objects.create(name='Benchmark')
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Benchmark product {i}',
+                    description='Benchmark description ' * 20,
+                    price=Decimal(10 + i % 190),
+                    category=category,
+                    gender='MWKU'[i % 4],
+                    brand=f'Brand {i % 50}',
+                )
+                for i in range(product_count)
+            ],
+            batch_size=2000,
+        )
+        product_ids = Product.objects.filter(category=category).values_list('id', flat=True)
+        batch = []
+        for i, product_id in enumerate(product_ids.iterator()):
+            for j in range(variants_per_product):
+                batch.append(ProductVariant(
+                    product_id=product_id,
+                    size=SIZES[(i + j // 2) % len(SIZES)],
+                    color=COLORS[(i + (j % 2) * 3) % len(COLORS)],
+                    sku=f'BENCH-{product_id}-{j}',
+                    stock_quantity=10,
+                ))
+            if len(batch) >= 5000:
+                ProductVariant.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ProductVariant.objects.bulk_create(batch)
+
+    def legacy_queryset(self, case):
+        queryset = Product.objects.filter(is_active=True)
+        if case.get('gender'):
+            queryset = queryset.filter(gender=case['gender'])
+        if case.get('size'):
+            queryset = queryset.filter(variants__size=case['size'])
+        if case.get('color'):
+            queryset = queryset.filter(variants__color__icontains=case['color'])
+        return queryset.distinct()
+
+    def exists_queryset(self, case):
+        queryset = Product.objects.filter(is_active=True)
+        if case.get('gender'):
+            queryset = queryset.filter(gender=case['gender'])
+        return filter_by_variants(queryset, size=case.get('size'), color=case.get('color'))
+
+    def timed(self, queryset, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = queryset.count()
+            page = list(queryset.order_by('-created_at', '-pk')[:20])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, count, [product.pk for product in page]
+
+    def compare(self, case, repeat):
+        legacy_time, legacy_count, legacy_page = self.timed(self.legacy_queryset(case), repeat)
+        exists_time, exists_count, exists_page = self.timed(self.exists_queryset(case), repeat)
+        same_ids = set(self.legacy_queryset(case).values_list('id', flat=True)) == set(
+            self.exists_queryset(case).values_list('id', flat=True)
+        )
+        identical = same_ids and legacy_count == exists_count and legacy_page == exists_page
+        self.stdout.write(
+            f'{case}: join+distinct {legacy_time * 1000:.1f}ms, exists {exists_time * 1000:.1f}ms, '
+            f'{exists_count} matches, identical={identical}'
+        )
+        if not identical:
+            self.stdout.write(self.style.ERROR(f'Result mismatch for {case}'))
@@ -0,0 +1,81 @@
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from products.coupons import redeem
+from products.models import CouponRedemption, GlobalDiscountCoupon
+
+
+class Command(BaseCommand):
+    help = 'Redeem one coupon from many threads and verify used_count, the limit and the ledger agree (test coupon is deleted afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=25, help='Redemptions attempted per thread')
+        parser.add_argument('--maximum-uses', type=int, default=100)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        coupon = GlobalDiscountCoupon.objects.create(
+            code=f'LOAD-{uuid.uuid4().hex[:8].upper()}',
+            description='Coupon concurrency check',
+            discount_type='fixed',
+            discount_value=Decimal('1.00'),
+            maximum_uses=options['maximum_uses'],
+            valid_from=now - timedelta(minutes=1),
+            valid_until=now + timedelta(hours=1),
+        )
+        try:
+            claimed, errors = self.hammer(coupon, options['threads'], options['attempts'])
+            self.report(coupon, claimed, errors, options)
+        finally:
+            CouponRedemption.objects.filter(coupon_type=coupon._meta.label_lower, coupon_id=coupon.pk).delete()
+            coupon.delete()
+
+    def hammer(self, coupon, thread_count, attempts):
+        barrier = threading.Barrier(thread_count)
+        lock = threading.Lock()
+        totals = {'claimed': 0, 'errors': 0}
+
+        def worker():
+            claimed = errors = 0
+            try:
+                barrier.wait()
+                for _ in range(attempts):
+                    try:
+                        if redeem(coupon, discount_amount=coupon.discount_value) is not None:
+                            claimed += 1
+                    except Exception:
+                        errors += 1
+            finally:
+                connection.close()
+                with lock:
+                    totals['claimed'] += claimed
+                    totals['errors'] += errors
+
+        threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['claimed'], totals['errors']
+
+    def report(self, coupon, claimed, errors, options):
+        coupon.refresh_from_db()
+        ledger = CouponRedemption.objects.filter(coupon_type=coupon._meta.label_lower, coupon_id=coupon.pk).count()
+        attempted = options['threads'] * options['attempts']
+        self.stdout.write(
+            f'{attempted} attempts: {claimed} claimed, {errors} database errors, '
+            f'used_count={coupon.used_count}, ledger rows={ledger}, limit={coupon.maximum_uses}'
+        )
+        if not (claimed == coupon.used_count == ledger) or coupon.used_count > coupon.maximum_uses:
+            self.stdout.write(self.style.ERROR('Counts disagree or the usage limit was exceeded'))
+        elif coupon.used_count < min(coupon.maximum_uses, attempted - errors):
+            self.stdout.write(self.style.WARNING('Fewer uses claimed than available'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Counts are exact'))
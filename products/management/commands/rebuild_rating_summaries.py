@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from products.models import Product, ProductReview
+
+
+class Command(BaseCommand):
+    help = 'Recompute the rating summary stored on each product from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = list(Product.RATING_SUMMARY_FIELDS)
+
+        aggregates = (
+            ProductReview.objects.order_by()
+            .values('product_id')
+            .annotate(
+                review_count=Count('id'),
+                rating_sum=Sum('rating'),
+                **{f'rating_{star}_count': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+            )
+        )
+
+        with transaction.atomic():
+            Product.objects.update(**{field: 0 for field in fields})
+
+            batch = []
+            updated = 0
+            for row in aggregates.iterator():
+                batch.append(Product(pk=row['product_id'], **{field: row[field] for field in fields}))
+                if len(batch) >= batch_size:
+                    Product.objects.bulk_update(batch, fields)
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Product.objects.bulk_update(batch, fields)
+                updated += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rating summaries for {updated} reviewed products')
+        )
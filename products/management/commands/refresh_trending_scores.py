@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from products.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute time-decayed trending scores from recent orders, cart adds, wishlist adds and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_scores(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed trending scores for {count} products'))
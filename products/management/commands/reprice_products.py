@@ -0,0 +1,101 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import repricing
+from products.facets import GENDER_CODES
+from products.models import PriceSnapshot, Product
+
+
+class Command(BaseCommand):
+    help = 'Apply a percentage or fixed price change to filtered products, or roll back an earlier change'
+
+    def add_arguments(self, parser):
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument('--percentage', type=float, help='Percent change, e.g. -20 for 20%% off')
+        change.add_argument('--fixed', type=str, help='Amount added to every price, e.g. -5.00')
+        change.add_argument('--rollback', type=int, metavar='SNAPSHOT_ID', help='Restore the prices saved by an earlier run')
+        parser.add_argument('--category', help='Category name')
+        parser.add_argument('--brand')
+        parser.add_argument('--gender', help='Men, Women, Kids, Unisex or M/W/K/U')
+        parser.add_argument('--include-inactive', action='store_true')
+        parser.add_argument('--original-price', choices=repricing.ORIGINAL_PRICE_POLICIES, default='keep',
+                            help="'set' keeps the current price as original_price on products that get cheaper")
+        parser.add_argument('--description', default='')
+        parser.add_argument('--dry-run', action='store_true', help='Show the changes without writing them')
+        parser.add_argument('--show', type=int, default=20, help='Number of changed products to list')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['rollback']:
+            return self.rollback(options)
+
+        queryset = Product.objects.all() if options['include_inactive'] else Product.objects.filter(is_active=True)
+        if options['category']:
+            queryset = queryset.filter(category__name__iexact=options['category'])
+        if options['brand']:
+            queryset = queryset.filter(brand__iexact=options['brand'])
+        if options['gender']:
+            queryset = queryset.filter(gender=GENDER_CODES.get(options['gender'], options['gender']))
+
+        mode, value = ('percentage', options['percentage']) if options['percentage'] is not None else ('fixed', options['fixed'])
+        start = time.perf_counter()
+        plan = repricing.plan(queryset, mode, value, original_price=options['original_price'])
+        planned = time.perf_counter() - start
+        self.show_diff(plan, options['show'])
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Dry run: {len(plan.product_ids)} products and {len(plan.variant_ids)} variant prices '
+                f'would change (planned in {planned:.2f}s)'
+            )
+            return
+        if not repricing.change_count(plan):
+            self.stdout.write('Nothing to change')
+            return
+
+        start = time.perf_counter()
+        snapshot = repricing.apply(plan, description=options['description'] or f'{mode} {value}', batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Repriced {snapshot.product_count} products and {len(plan.variant_ids)} variant prices '
+            f'in {planned + time.perf_counter() - start:.2f}s. '
+            f'Undo with --rollback {snapshot.pk}'
+        ))
+
+    def show_diff(self, plan, limit):
+        names = Product.objects.in_bulk([int(pk) for pk in plan.product_ids[:limit]])
+        for i in range(min(limit, len(plan.product_ids))):
+            product = names.get(int(plan.product_ids[i]))
+            line = f'  {plan.product_ids[i]:>8} {product.name if product else "":<40.40} ' \
+                   f'{plan.old_prices[i] / 100:>10.2f} -> {plan.new_prices[i] / 100:>10.2f}'
+            if plan.old_originals[i] != plan.new_originals[i]:
+                line += f' (original {self.price(plan.old_originals[i])} -> {self.price(plan.new_originals[i])})'
+            self.stdout.write(line)
+        if len(plan.product_ids) > limit:
+            self.stdout.write(f'  ... and {len(plan.product_ids) - limit} more')
+        if len(plan.product_ids):
+            self.stdout.write(
+                f'Catalog value {plan.old_prices.sum() / 100:,.2f} -> {plan.new_prices.sum() / 100:,.2f}'
+            )
+        if len(plan.variant_ids):
+            self.stdout.write(
+                f'{len(plan.variant_ids)} variants with their own price: '
+                f'{plan.old_variant_prices.sum() / 100:,.2f} -> {plan.new_variant_prices.sum() / 100:,.2f}'
+            )
+
+    def price(self, cents):
+        return 'none' if cents == repricing.NO_PRICE else f'{cents / 100:.2f}'
+
+    def rollback(self, options):
+        try:
+            snapshot = PriceSnapshot.objects.get(pk=options['rollback'])
+        except PriceSnapshot.DoesNotExist:
+            raise CommandError(f'Snapshot {options["rollback"]} does not exist')
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: would restore {snapshot.product_count} products from snapshot {snapshot.pk}')
+            return
+        try:
+            repricing.rollback(snapshot, batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Restored {snapshot.product_count} products from snapshot {snapshot.pk}'))
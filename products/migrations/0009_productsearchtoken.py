@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:59
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# A frozen copy of the tokenizer in products.search as of this migration
+TOKEN_RE = re.compile(r'[^\W_]+')
+FIELD_WEIGHTS = {'name': 8, 'brand': 4, 'category': 2, 'description': 1}
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:64] for token in TOKEN_RE.findall(text.lower()) if len(token) >= 2]
+
+
+def product_token_weights(product):
+    weights = {}
+    sources = {
+        'name': product.name,
+        'brand': product.brand,
+        'category': product.category.name if product.category_id else '',
+        'description': product.description,
+    }
+    for field, text in sources.items():
+        for token in set(tokenize(text)):
+            weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+    return weights
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductSearchToken = apps.get_model('products', 'ProductSearchToken')
+    rows = []
+    for product in Product.objects.select_related('category').order_by('pk').iterator(chunk_size=500):
+        rows.extend(
+            ProductSearchToken(product_id=product.pk, token=token, weight=weight)
+            for token, weight in product_token_weights(product).items()
+        )
+        if len(rows) >= 5000:
+            ProductSearchToken.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    ProductSearchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='products.product')),
+            ],
+            options={
+                'unique_together': {('product', 'token')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
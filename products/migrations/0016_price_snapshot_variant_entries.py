@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricesnapshot',
+            name='variant_entries',
+            field=models.JSONField(default=list),
+        ),
+    ]
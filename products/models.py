@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from . import pricing
+
 User = get_user_model()
 
 
@@ -9,6 +11,7 @@ class Category(models.Model):
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -44,15 +47,43 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Rating summary, maintained by products.signals on ProductReview changes
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    RATING_SUMMARY_FIELDS = (
+        'review_count', 'rating_sum',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on (created_at, id) and (price, id) for active products
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+            # MAX(updated_at) for conditional GETs
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def get_primary_image(self):
+        """Return the primary ProductImage, using prefetched images when available."""
+        primary_images = getattr(self, 'primary_images', None)
+        if primary_images is None:
+            primary_images = [image for image in self.images.all() if image.is_primary]
+        return primary_images[0] if primary_images else None
+
     @property
     def primary_image(self):
-        primary_img = self.images.filter(is_primary=True).first()
+        primary_img = self.get_primary_image()
         if primary_img:
             return primary_img.image.url
         first_img = self.images.first()
@@ -62,14 +93,17 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if not reviews:
+        if not self.review_count:
             return 0
-        return sum(review.rating for review in reviews) / len(reviews)
+        return self.rating_sum / self.review_count
 
     @property
     def total_reviews(self):
-        return self.reviews.count()
+        return self.review_count
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
 
     @property
     def discount_percentage(self):
@@ -132,9 +166,17 @@ class ProductReview(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.user.email} - {self.rating} stars"
 
+    def save(self, *args, **kwargs):
+        # Keep the review row and the product's rating summary in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ['product', 'user']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_idx'),
+        ]
 
 
 class Wishlist(models.Model):
@@ -150,6 +192,39 @@ class Wishlist(models.Model):
         return f"{self.user.email} - {self.product.name}"
 
 
+class ProductSearchToken(models.Model):
+    """Inverted index entry: one row per distinct token per product, see products.search."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64, db_index=True)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['product', 'token']
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id} ({self.weight})"
+
+
+class ProductTrendingScore(models.Model):
+    """Time-decayed popularity score per product, see products.trending."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='trending_score')
+    score = models.FloatField(default=0)
+    # Copied from the product so top-K lookups per gender/category are one index scan
+    gender = models.CharField(max_length=1, choices=Product.GENDER_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score'], name='trending_score_idx'),
+            models.Index(fields=['gender', 'score'], name='trending_gender_score_idx'),
+            models.Index(fields=['category', 'score'], name='trending_category_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.score:.2f}"
+
+
 class ProductDiscount(models.Model):
     DISCOUNT_TYPES = [
         ('percentage', 'Percentage'),
@@ -217,13 +292,45 @@ class GlobalDiscountCoupon(models.Model):
         )
 
     def calculate_discount(self, order_amount):
-        if not self.is_valid() or order_amount < self.minimum_order_amount:
+        if not self.is_valid():
             return 0
-        
-        if self.discount_type == 'percentage':
-            discount = (order_amount * self.discount_value) / 100
-            if self.maximum_discount_amount:
-                discount = min(discount, self.maximum_discount_amount)
-            return discount
-        else:  # fixed
-            return min(self.discount_value, order_amount)
\ No newline at end of file
+        return pricing.coupon_discount(self, order_amount)
+
+
+class PriceSnapshot(models.Model):
+    """Prices before a bulk repricing, see products.repricing."""
+    description = models.CharField(max_length=200, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    product_count = models.PositiveIntegerField(default=0)
+    # [product_id, price_cents, original_price_cents (-1 for none)] per repriced product
+    entries = models.JSONField(default=list)
+    # [variant_id, price_cents] per repriced variant with its own price
+    variant_entries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Snapshot {self.pk} - {self.description or self.product_count}"
+
+
+class CouponRedemption(models.Model):
+    """One successful use of a ProductDiscount, GlobalDiscountCoupon or DiscountCode."""
+    coupon_type = models.CharField(max_length=100)
+    coupon_id = models.PositiveIntegerField()
+    code = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='coupon_redemptions')
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='coupon_redemptions')
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['coupon_type', 'coupon_id', 'created_at'], name='redemption_coupon_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.code} - {self.discount_amount}"
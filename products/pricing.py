@@ -0,0 +1,100 @@
+"""
+Pricing for carts, checkout and coupon checks.
+
+quote() prices a cart snapshot in one pass: every line at its variant's
+price (falling back to the product price), then the discounts in order,
+each taken from what is left of the subtotal, then tax and shipping. The
+cart, checkout and coupon endpoints all go through it, so the tax rate and
+free-shipping threshold live in one place (TAX_RATE, FREE_SHIPPING_THRESHOLD
+and SHIPPING_COST settings).
+
+Coupons are anything with ``code``, ``discount_type`` and ``discount_value``
+(and optionally ``minimum_order_amount`` and ``maximum_discount_amount``):
+model instances or products.coupons.CouponRule snapshots. Validity is the
+caller's concern.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+PricedLine = namedtuple('PricedLine', ['variant_id', 'product_id', 'quantity', 'unit_price', 'total'])
+AppliedDiscount = namedtuple('AppliedDiscount', ['coupon', 'amount'])
+Quote = namedtuple('Quote', [
+    'lines', 'subtotal', 'discounts', 'discount_amount', 'tax_amount', 'shipping_cost', 'total',
+])
+
+
+def _setting(name, default):
+    return Decimal(str(getattr(settings, name, default)))
+
+
+def to_amount(value, default=ZERO):
+    """Parse a request value as a Decimal amount."""
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return default
+
+
+def unit_price(variant):
+    return variant.price if variant.price is not None else variant.product.price
+
+
+def coupon_discount(coupon, amount, order_amount=None):
+    """Discount ``coupon`` gives on ``amount``; the minimum order is checked against ``order_amount``."""
+    order_amount = amount if order_amount is None else order_amount
+    if order_amount < getattr(coupon, 'minimum_order_amount', ZERO):
+        return ZERO
+    if coupon.discount_type == 'percentage':
+        discount = amount * coupon.discount_value / 100
+        cap = getattr(coupon, 'maximum_discount_amount', None)
+        if cap:
+            discount = min(discount, cap)
+    else:
+        discount = coupon.discount_value
+    return min(discount, amount).quantize(CENT, ROUND_HALF_UP)
+
+
+def quote(lines, coupons=()):
+    """
+    Price ``lines``, an iterable of ``(variant, quantity)``, with ``coupons`` stacked in order.
+
+    Variants need their product loaded (select_related) when they have no
+    price of their own.
+    """
+    priced = []
+    subtotal = ZERO
+    for variant, quantity in lines:
+        price = unit_price(variant)
+        total = price * quantity
+        priced.append(PricedLine(variant.pk, variant.product_id, quantity, price, total))
+        subtotal += total
+
+    discounts = []
+    remaining = subtotal
+    for coupon in coupons:
+        amount = coupon_discount(coupon, remaining, order_amount=subtotal)
+        if amount:
+            discounts.append(AppliedDiscount(coupon, amount))
+            remaining -= amount
+    discount_amount = subtotal - remaining
+
+    tax_amount = (subtotal * _setting('TAX_RATE', '0.08')).quantize(CENT, ROUND_HALF_UP)
+    if not priced or subtotal >= _setting('FREE_SHIPPING_THRESHOLD', '100.00'):
+        shipping_cost = ZERO
+    else:
+        shipping_cost = _setting('SHIPPING_COST', '10.00')
+
+    return Quote(
+        lines=priced,
+        subtotal=subtotal,
+        discounts=discounts,
+        discount_amount=discount_amount,
+        tax_amount=tax_amount,
+        shipping_cost=shipping_cost,
+        total=subtotal + tax_amount + shipping_cost - discount_amount,
+    )
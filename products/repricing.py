@@ -0,0 +1,206 @@
+"""
+Bulk repricing of the catalog.
+
+plan() loads the prices of the selected products into NumPy arrays of
+integer cents and computes every new price in one vectorized step. apply()
+first records a PriceSnapshot of the rows it changes and then writes the
+new prices with chunked bulk_update. rollback() restores a snapshot the
+same way. Used by the reprice_products command and the product admin.
+
+Variants with their own price (ProductVariant.price) are what carts and
+checkout charge, so their prices get the same change as their products
+and are snapshotted and restored with them.
+
+bulk_update skips save signals, so carts holding repriced products are
+refreshed, the facet index is marked stale and the catalog response cache
+is invalidated here.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import Cart
+from fashion_store.cache import bump_catalog_version
+
+from .facets import facet_index
+from .models import PriceSnapshot, Product, ProductVariant
+
+NO_PRICE = -1
+MIN_PRICE_CENTS = 1
+
+ORIGINAL_PRICE_POLICIES = ('keep', 'set', 'clear')
+
+RepricingPlan = namedtuple('RepricingPlan', [
+    'product_ids', 'old_prices', 'new_prices', 'old_originals', 'new_originals',
+    'variant_ids', 'old_variant_prices', 'new_variant_prices',
+])
+
+
+def _to_cents(values):
+    return np.fromiter(
+        (int(value * 100) if value is not None else NO_PRICE for value in values), dtype=np.int64, count=len(values)
+    )
+
+
+def _to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2) if cents != NO_PRICE else None
+
+
+def change_count(repricing_plan):
+    return len(repricing_plan.product_ids) + len(repricing_plan.variant_ids)
+
+
+def _reprice(old_prices, mode, value):
+    if mode == 'percentage':
+        new_prices = np.rint(old_prices * (1 + float(value) / 100)).astype(np.int64)
+    else:
+        new_prices = old_prices + int(round(Decimal(str(value)) * 100))
+    return np.maximum(new_prices, MIN_PRICE_CENTS)
+
+
+def plan(queryset, mode, value, original_price='keep'):
+    """
+    Compute new prices for ``queryset``.
+
+    ``mode`` is 'percentage' (``value`` is a percent change, -20 for 20% off)
+    or 'fixed' (``value`` is an amount added to every price). With
+    ``original_price='set'``, products that get cheaper and have no original
+    price keep their current price as the original, so they show as on sale;
+    'clear' removes original prices. Variant price overrides of the
+    selected products get the same change.
+    """
+    if mode not in ('percentage', 'fixed'):
+        raise ValueError(f'Unknown repricing mode: {mode}')
+    if original_price not in ORIGINAL_PRICE_POLICIES:
+        raise ValueError(f'Unknown original price policy: {original_price}')
+
+    rows = list(queryset.order_by('pk').values_list('pk', 'price', 'original_price'))
+    product_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    old_prices = _to_cents([row[1] for row in rows])
+    old_originals = _to_cents([row[2] for row in rows])
+
+    new_prices = _reprice(old_prices, mode, value)
+
+    if original_price == 'set':
+        on_sale = (old_originals == NO_PRICE) & (new_prices < old_prices)
+        new_originals = np.where(on_sale, old_prices, old_originals)
+    elif original_price == 'clear':
+        new_originals = np.full_like(old_originals, NO_PRICE)
+    else:
+        new_originals = old_originals
+
+    variant_rows = list(
+        ProductVariant.objects.filter(product__in=product_ids.tolist(), price__isnull=False)
+        .order_by('pk').values_list('pk', 'price')
+    )
+    variant_ids = np.fromiter((row[0] for row in variant_rows), dtype=np.int64, count=len(variant_rows))
+    old_variant_prices = _to_cents([row[1] for row in variant_rows])
+    new_variant_prices = _reprice(old_variant_prices, mode, value)
+
+    changed = (new_prices != old_prices) | (new_originals != old_originals)
+    variant_changed = new_variant_prices != old_variant_prices
+    return RepricingPlan(
+        product_ids=product_ids[changed],
+        old_prices=old_prices[changed],
+        new_prices=new_prices[changed],
+        old_originals=old_originals[changed],
+        new_originals=new_originals[changed],
+        variant_ids=variant_ids[variant_changed],
+        old_variant_prices=old_variant_prices[variant_changed],
+        new_variant_prices=new_variant_prices[variant_changed],
+    )
+
+
+def _write_prices(product_ids, prices, originals, batch_size):
+    """
+    Write new prices. A promotion maps the catalog onto few distinct price
+    points, so products sharing a (price, original price) pair get one
+    UPDATE ... WHERE id IN (...) per chunk; bulk_update is the fallback when
+    nearly every product ends up with its own price.
+    """
+    if not len(product_ids):
+        return
+    now = timezone.now()
+    groups, inverse, counts = np.unique(
+        np.column_stack([prices, originals]), axis=0, return_inverse=True, return_counts=True
+    )
+    if len(groups) * 4 <= len(product_ids):
+        inverse = inverse.reshape(-1)
+        grouped_ids = np.split(product_ids[np.argsort(inverse, kind='stable')], np.cumsum(counts)[:-1])
+        for (price, original), ids in zip(groups, grouped_ids):
+            for start in range(0, len(ids), batch_size):
+                Product.objects.filter(pk__in=ids[start:start + batch_size].tolist()).update(
+                    price=_to_decimal(price), original_price=_to_decimal(original), updated_at=now
+                )
+    else:
+        for start in range(0, len(product_ids), batch_size):
+            chunk = slice(start, start + batch_size)
+            Product.objects.bulk_update([
+                Product(pk=int(pk), price=_to_decimal(price), original_price=_to_decimal(original), updated_at=now)
+                for pk, price, original in zip(product_ids[chunk], prices[chunk], originals[chunk])
+            ], ['price', 'original_price', 'updated_at'])
+
+    for start in range(0, len(product_ids), batch_size):
+        ids = product_ids[start:start + batch_size].tolist()
+        Cart.refresh_totals(Cart.objects.filter(items__product_variant__product_id__in=ids))
+
+
+def _write_variant_prices(variant_ids, prices, batch_size):
+    now = timezone.now()
+    for start in range(0, len(variant_ids), batch_size):
+        chunk = slice(start, start + batch_size)
+        ids = variant_ids[chunk].tolist()
+        ProductVariant.objects.bulk_update([
+            ProductVariant(pk=int(pk), price=_to_decimal(price)) for pk, price in zip(ids, prices[chunk])
+        ], ['price'])
+        # The catalog ETags follow Product.updated_at
+        Product.objects.filter(variants__in=ids).update(updated_at=now)
+        Cart.refresh_totals(Cart.objects.filter(items__product_variant_id__in=ids))
+
+
+def _prices_written():
+    facet_index.mark_stale()
+    bump_catalog_version()
+
+
+def apply(repricing_plan, description='', user=None, batch_size=1000):
+    """Write ``repricing_plan`` and return the PriceSnapshot that undoes it."""
+    with transaction.atomic():
+        snapshot = PriceSnapshot.objects.create(
+            description=description,
+            created_by=user,
+            product_count=len(repricing_plan.product_ids),
+            entries=np.column_stack([
+                repricing_plan.product_ids, repricing_plan.old_prices, repricing_plan.old_originals,
+            ]).tolist(),
+            variant_entries=np.column_stack([
+                repricing_plan.variant_ids, repricing_plan.old_variant_prices,
+            ]).tolist(),
+        )
+        _write_prices(repricing_plan.product_ids, repricing_plan.new_prices, repricing_plan.new_originals, batch_size)
+        _write_variant_prices(repricing_plan.variant_ids, repricing_plan.new_variant_prices, batch_size)
+    _prices_written()
+    return snapshot
+
+
+def rollback(snapshot, batch_size=1000):
+    """Restore the prices recorded in ``snapshot``."""
+    if snapshot.rolled_back_at is not None:
+        raise ValueError(f'Snapshot {snapshot.pk} was already rolled back')
+    # Snapshots undo in reverse order; restoring an older one first would bring back stale prices later
+    newer = list(
+        PriceSnapshot.objects.filter(pk__gt=snapshot.pk, rolled_back_at__isnull=True).values_list('pk', flat=True)
+    )
+    if newer:
+        raise ValueError(f'Roll back snapshots {", ".join(map(str, sorted(newer, reverse=True)))} first')
+    entries = np.array(snapshot.entries, dtype=np.int64).reshape(-1, 3)
+    variant_entries = np.array(snapshot.variant_entries, dtype=np.int64).reshape(-1, 2)
+    with transaction.atomic():
+        _write_prices(entries[:, 0], entries[:, 1], entries[:, 2], batch_size)
+        _write_variant_prices(variant_entries[:, 0], variant_entries[:, 1], batch_size)
+        snapshot.rolled_back_at = timezone.now()
+        snapshot.save(update_fields=['rolled_back_at'])
+    _prices_written()
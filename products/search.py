@@ -0,0 +1,133 @@
+"""
+Product search backed by the ProductSearchToken inverted index.
+
+Each product is tokenized over its name, brand, category name and
+description. A query matches products containing every query term; the
+last term is matched as a prefix so type-ahead input returns results
+before the word is complete. Results are ranked by the summed field
+weights of the matching tokens.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+
+from .models import Product, ProductSearchToken
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+FIELD_WEIGHTS = {
+    'name': 8,
+    'brand': 4,
+    'category': 2,
+    'description': 1,
+}
+
+# Product fields whose change requires the product to be reindexed
+INDEXED_FIELDS = {'name', 'brand', 'description', 'category', 'category_id'}
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+
+def product_token_weights(product):
+    weights = {}
+    sources = {
+        'name': product.name,
+        'brand': product.brand,
+        'category': product.category.name if product.category_id else '',
+        'description': product.description,
+    }
+    for field, text in sources.items():
+        for token in set(tokenize(text)):
+            weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+    return weights
+
+
+def index_products(products):
+    """Rebuild the index rows for the given products (expects category to be loaded)."""
+    products = list(products)
+    if not products:
+        return 0
+    rows = [
+        ProductSearchToken(product=product, token=token, weight=weight)
+        for product in products
+        for token, weight in product_token_weights(product).items()
+    ]
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product__in=[product.pk for product in products]).delete()
+        ProductSearchToken.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def index_product(product):
+    return index_products([product])
+
+
+def _term_filters(terms):
+    filters = [Q(token=term) for term in terms[:-1]]
+    filters.append(Q(token__startswith=terms[-1]))
+    return filters
+
+
+def _matching_products(terms):
+    """Grouped token rows for products that match every term, with their rank."""
+    filters = _term_filters(terms)
+    matched = {
+        f'matched_{i}': Max(Case(When(term_filter, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, term_filter in enumerate(filters)
+    }
+    return (
+        ProductSearchToken.objects.filter(reduce(or_, filters))
+        .order_by()
+        .values('product_id')
+        .annotate(rank=Sum('weight'), **matched)
+        .filter(**{name: 1 for name in matched})
+    )
+
+
+def search_products(queryset, query):
+    """
+    Restrict a Product queryset to products matching ``query``.
+
+    Matching products are annotated with ``search_rank``; callers decide
+    whether to order by it. An empty query leaves the queryset untouched; a
+    query with no searchable terms (``a``, ``!!``) matches nothing.
+    """
+    if not query or not query.strip():
+        return queryset
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset.none()
+    matches = _matching_products(terms)
+    return queryset.filter(pk__in=matches.values('product_id')).annotate(
+        search_rank=Subquery(matches.filter(product_id=OuterRef('pk')).values('rank')[:1])
+    )
+
+
+def rebuild_index(batch_size=500):
+    indexed = 0
+    queryset = Product.objects.select_related('category').order_by('pk')
+    batch = []
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        index_products(batch)
+        indexed += len(batch)
+    return indexed
@@ -1,8 +1,54 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Category, Product, ProductImage, ProductVariant, ProductReview, ProductDiscount, Wishlist, GlobalDiscountCoupon
 from authentication.models import User
 
 
+def primary_image_prefetch(lookup='images'):
+    """Prefetch only primary images into ``primary_images`` on the products at ``lookup``."""
+    return Prefetch(lookup, queryset=ProductImage.objects.filter(is_primary=True), to_attr='primary_images')
+
+
+def primary_image_url(product, request=None):
+    primary_img = product.get_primary_image()
+    if not primary_img:
+        return None
+    if request:
+        return request.build_absolute_uri(primary_img.image.url)
+    return primary_img.image.url
+
+
+REVIEW_PREVIEW_SIZE = 3
+
+
+def review_preview_prefetch(lookup='reviews'):
+    """Prefetch the newest reviews of each product into ``review_preview``."""
+    queryset = ProductReview.objects.select_related('user').order_by('-created_at', '-id')[:REVIEW_PREVIEW_SIZE]
+    return Prefetch(lookup, queryset=queryset, to_attr='review_preview')
+
+
+def requested_fields(request):
+    """Field names from ``?fields=a,b`` on a read request, or None for all fields."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Serialize only the fields named by ``?fields=`` (``id`` is always kept)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields - {'id'}:
+                self.fields.pop(name)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -25,13 +71,7 @@ class ProductVariantSerializer(serializers.ModelSerializer):
             fields = ('id', 'name', 'price', 'primary_image')
 
         def get_primary_image(self, obj):
-            primary_img = obj.images.filter(is_primary=True).first()
-            if primary_img:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(primary_img.image.url)
-                return primary_img.image.url
-            return None
+            return primary_image_url(obj, self.context.get('request'))
 
     product = ProductMinimalSerializer(read_only=True)
 
@@ -50,29 +90,28 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ('user', 'created_at', 'updated_at')
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
-    reviews = ProductReviewSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    total_reviews = serializers.SerializerMethodField()
+    # The newest few reviews; the full list is paginated at /api/products/<id>/reviews/
+    review_preview = serializers.SerializerMethodField()
+    average_rating = serializers.ReadOnlyField()
+    total_reviews = serializers.ReadOnlyField()
+    rating_histogram = serializers.ReadOnlyField()
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = Product.RATING_SUMMARY_FIELDS
 
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+    def get_review_preview(self, obj):
+        reviews = getattr(obj, 'review_preview', None)
+        if reviews is None:
+            reviews = obj.reviews.select_related('user').order_by('-created_at', '-id')[:REVIEW_PREVIEW_SIZE]
+        return ProductReviewSerializer(reviews, many=True, context=self.context).data
 
-    def get_total_reviews(self, obj):
-        return obj.reviews.count()
 
-
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
@@ -84,19 +123,13 @@ class ProductListSerializer(serializers.ModelSerializer):
                  'primary_image', 'average_rating', 'total_reviews', 'created_at')
 
     def get_primary_image(self, obj):
-        primary_img = obj.images.filter(is_primary=True).first()
-        if primary_img:
-            return self.context['request'].build_absolute_uri(primary_img.image.url)
-        return None
+        return primary_image_url(obj, self.context.get('request'))
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return round(sum(review.rating for review in reviews) / len(reviews), 1)
-        return 0
+        return round(obj.average_rating, 1)
 
     def get_total_reviews(self, obj):
-        return obj.reviews.count()
+        return obj.total_reviews
 
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
@@ -106,6 +139,7 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        read_only_fields = Product.RATING_SUMMARY_FIELDS
 
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
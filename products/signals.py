@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from cart.models import CartItem
+from fashion_store.cache import bump_catalog_version
+from orders.models import DiscountCode, OrderItem
+
+from .models import (
+    Category, GlobalDiscountCoupon, Product, ProductDiscount, ProductImage, ProductReview, ProductVariant, Wishlist,
+)
+from . import search, trending
+from .coupons import coupon_rules
+from .facets import facet_index
+from .suggest import suggestion_index
+
+
+def _rating_deltas(rating, sign):
+    return {
+        'review_count': sign,
+        'rating_sum': sign * rating,
+        f'rating_{rating}_count': sign,
+    }
+
+
+def _apply_rating_changes(changes):
+    """Apply (product_id, rating, sign) changes with one UPDATE per product."""
+    per_product = defaultdict(lambda: defaultdict(int))
+    for product_id, rating, sign in changes:
+        for field, delta in _rating_deltas(rating, sign).items():
+            per_product[product_id][field] += delta
+
+    for product_id, deltas in per_product.items():
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            Product.objects.filter(pk=product_id).update(**updates)
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = (
+            ProductReview.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    changes = [(instance.product_id, instance.rating, 1)]
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        changes.append((previous[0], previous[1], -1))
+    _apply_rating_changes(changes)
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    _apply_rating_changes([(instance.product_id, instance.rating, -1)])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def touch_product(sender, instance, raw=False, **kwargs):
+    """Product.updated_at drives the catalog ETags, so changes to a product's rows move it."""
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    suggestion_index.update_product(instance)
+    if update_fields is not None and not search.INDEXED_FIELDS.intersection(update_fields):
+        return
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def sync_trending_score(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    trending.sync_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_suggestions(sender, instance, **kwargs):
+    suggestion_index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    suggestion_index.update_category(instance)
+    if not created:
+        search.index_products(instance.products.select_related('category'))
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_suggestions(sender, instance, **kwargs):
+    suggestion_index.remove_category(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Category)
+def mark_facets_stale(sender, **kwargs):
+    facet_index.mark_stale()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=GlobalDiscountCoupon)
+@receiver(post_delete, sender=GlobalDiscountCoupon)
+def invalidate_catalog_cache(sender, raw=False, **kwargs):
+    if not raw:
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=OrderItem)
+def record_order_trending(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_event(instance.product_variant.product_id, 'order', instance.quantity)
+
+
+@receiver(post_save, sender=CartItem)
+def record_cart_trending(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_event(instance.product_variant.product_id, 'cart')
+
+
+@receiver(post_save, sender=Wishlist)
+def record_wishlist_trending(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_event(instance.product_id, 'wishlist')
+
+
+@receiver(post_save, sender=ProductReview)
+def record_review_trending(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_event(instance.product_id, 'review')
+
+
+@receiver(post_save, sender=ProductDiscount)
+@receiver(post_delete, sender=ProductDiscount)
+@receiver(post_save, sender=GlobalDiscountCoupon)
+@receiver(post_delete, sender=GlobalDiscountCoupon)
+@receiver(post_save, sender=DiscountCode)
+@receiver(post_delete, sender=DiscountCode)
+def clear_coupon_rules(sender, **kwargs):
+    coupon_rules.clear()
@@ -0,0 +1,185 @@
+"""
+In-process type-ahead index for product names, brands and category names.
+
+Suggestions are kept in one sorted list of ``(key, ref)`` tuples per kind,
+so the matches of a prefix are the slice between two ``bisect`` calls.
+Kinds are ranked by KIND_WEIGHTS and, within a kind, shorter texts first;
+a lower kind is only read when the higher ones do not fill the limit.
+Every word of a product name starts its own key, so "jea" completes
+"Blue Denim Jeans".
+
+The index is built lazily from the database on first use, patched in place
+by the Product/Category signals in products.signals, and rebuilt after
+SUGGEST_INDEX_TTL seconds so worker processes that did not see a change
+catch up.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .models import Category, Product
+from .search import TOKEN_RE
+
+KIND_WEIGHTS = {
+    'category': 3,
+    'brand': 2,
+    'product': 1,
+}
+
+# Sorts after every key that starts with the prefix
+PREFIX_END = '\uffff'
+
+
+def _words(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _normalize(text):
+    return ' '.join(_words(text))
+
+
+def _keys_for(text):
+    words = _words(text)
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = {kind: [] for kind in KIND_WEIGHTS}
+        self._entries = {}
+        self._brand_refs = {}
+        self._product_brands = {}
+        self._built_at = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'SUGGEST_INDEX_TTL', 300)
+
+    def is_built(self):
+        return self._built_at is not None
+
+    def _add_entry(self, kind, ref, text, keep_sorted=True):
+        self._entries[(kind, ref)] = text
+        keys = self._keys[kind]
+        for key in _keys_for(text):
+            if keep_sorted:
+                insort(keys, (key, ref))
+            else:
+                keys.append((key, ref))
+
+    def _remove_entry(self, kind, ref):
+        text = self._entries.pop((kind, ref), None)
+        if text is None:
+            return
+        keys = self._keys[kind]
+        for key in _keys_for(text):
+            item = (key, ref)
+            i = bisect_left(keys, item)
+            if i < len(keys) and keys[i] == item:
+                del keys[i]
+
+    def _add_product(self, product_id, name, brand, keep_sorted=True):
+        self._add_entry('product', product_id, name, keep_sorted)
+        ref = _normalize(brand)
+        if not ref:
+            return
+        self._product_brands[product_id] = ref
+        count = self._brand_refs.get(ref, 0)
+        self._brand_refs[ref] = count + 1
+        if count == 0:
+            self._add_entry('brand', ref, brand, keep_sorted)
+
+    def _remove_product(self, product_id):
+        self._remove_entry('product', product_id)
+        ref = self._product_brands.pop(product_id, None)
+        if ref is None:
+            return
+        count = self._brand_refs.get(ref, 0)
+        if count <= 1:
+            self._brand_refs.pop(ref, None)
+            self._remove_entry('brand', ref)
+        else:
+            self._brand_refs[ref] = count - 1
+
+    def rebuild(self):
+        products = Product.objects.filter(is_active=True).values_list('id', 'name', 'brand')
+        categories = Category.objects.filter(is_active=True).values_list('id', 'name')
+        with self._lock:
+            self._keys = {kind: [] for kind in KIND_WEIGHTS}
+            self._entries = {}
+            self._brand_refs = {}
+            self._product_brands = {}
+            for product_id, name, brand in products.iterator():
+                self._add_product(product_id, name, brand, keep_sorted=False)
+            for category_id, name in categories:
+                self._add_entry('category', category_id, name, keep_sorted=False)
+            for keys in self._keys.values():
+                keys.sort()
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild()
+
+    def update_product(self, product):
+        if not self.is_built():
+            return
+        with self._lock:
+            self._remove_product(product.pk)
+            if product.is_active:
+                self._add_product(product.pk, product.name, product.brand)
+
+    def remove_product(self, product_id):
+        if not self.is_built():
+            return
+        with self._lock:
+            self._remove_product(product_id)
+
+    def update_category(self, category):
+        if not self.is_built():
+            return
+        with self._lock:
+            self._remove_entry('category', category.pk)
+            if category.is_active:
+                self._add_entry('category', category.pk, category.name)
+
+    def remove_category(self, category_id):
+        if not self.is_built():
+            return
+        with self._lock:
+            self._remove_entry('category', category_id)
+
+    def suggest(self, prefix, limit=10):
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        self._ensure_fresh()
+
+        ranked = []
+        with self._lock:
+            for kind in sorted(KIND_WEIGHTS, key=KIND_WEIGHTS.get, reverse=True):
+                if len(ranked) >= limit:
+                    break
+                keys = self._keys[kind]
+                start = bisect_left(keys, (prefix,))
+                end = bisect_left(keys, (prefix + PREFIX_END,), start)
+                # A name can match on several of its words; each entry is ranked once
+                texts = {ref: self._entries.get((kind, ref)) for _, ref in keys[start:end]}
+                best = heapq.nsmallest(
+                    limit - len(ranked),
+                    ((ref, text) for ref, text in texts.items() if text),
+                    key=lambda item: (len(item[1]), item[1].lower()),
+                )
+                ranked.extend((kind, ref, text) for ref, text in best)
+
+        return [
+            {'text': text, 'type': kind, 'id': ref if kind != 'brand' else None}
+            for kind, ref, text in ranked
+        ]
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,322 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from fashion_store.cache import bump_catalog_version, get_cache
+from orders.models import DiscountCode, Order, OrderItem
+
+from . import repricing
+from .coupons import coupon_rules, redeem
+from .models import (
+    Category, CouponRedemption, GlobalDiscountCoupon, Product, ProductImage, ProductReview, ProductVariant, Wishlist,
+)
+from .suggest import SuggestionIndex
+
+User = get_user_model()
+
+SMALL, LARGE = 3, 12
+
+
+class PrimaryImageQueryCountTests(TestCase):
+    """Primary images come from prefetched data, so query counts do not grow with the page."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='shopper', email='shopper@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Shirts')
+
+    def make_products(self, count):
+        products = []
+        for _ in range(count):
+            product = Product.objects.create(
+                name=f'Shirt {Product.objects.count()}', description='cotton', price=Decimal('20.00'),
+                category=self.category, brand='Acme', gender='U',
+            )
+            ProductImage.objects.create(product=product, image='products/a.jpg', is_primary=False)
+            ProductImage.objects.create(product=product, image='products/b.jpg', is_primary=True, order=1)
+            ProductVariant.objects.create(product=product, size='M', color='Blue', sku=f'SKU-{product.pk}', stock_quantity=10)
+            products.append(product)
+        return products
+
+    def add_to_wishlist(self, count):
+        for product in self.make_products(count):
+            Wishlist.objects.create(user=self.user, product=product)
+
+    def add_to_cart(self, count):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        for product in self.make_products(count):
+            CartItem.objects.create(cart=cart, product_variant=product.variants.get(), quantity=1)
+
+    def place_orders(self, count):
+        for product in self.make_products(count):
+            order = Order.objects.create(
+                user=self.user, shipping_address='1 Main St', shipping_city='Town', shipping_state='ST',
+                shipping_zip='12345', shipping_country='US', subtotal=Decimal('20.00'), total_amount=Decimal('20.00'),
+            )
+            OrderItem.objects.create(order=order, product_variant=product.variants.get(), quantity=1, price=Decimal('20.00'))
+
+    def place_order_with_items(self, count):
+        order = Order.objects.create(
+            user=self.user, shipping_address='1 Main St', shipping_city='Town', shipping_state='ST',
+            shipping_zip='12345', shipping_country='US', subtotal=Decimal('20.00'), total_amount=Decimal('20.00'),
+        )
+        for product in self.make_products(count):
+            OrderItem.objects.create(order=order, product_variant=product.variants.get(), quantity=1, price=Decimal('20.00'))
+        return order
+
+    def assert_constant_queries(self, queries, url, populate):
+        for count in (SMALL, LARGE - SMALL):
+            populate(count)
+            get_cache().clear()
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_list(self):
+        response = self.assert_constant_queries(4, '/api/products/', self.make_products)
+        self.assertEqual(len(response.data['results']), LARGE)
+        self.assertTrue(all(item['primary_image'].endswith('b.jpg') for item in response.data['results']))
+
+    def test_wishlist(self):
+        response = self.assert_constant_queries(3, '/api/products/wishlist/', self.add_to_wishlist)
+        self.assertEqual(len(response.data['results']), LARGE)
+
+    def test_cart(self):
+        response = self.assert_constant_queries(3, '/api/cart/', self.add_to_cart)
+        self.assertEqual(len(response.data['items']), LARGE)
+
+    def test_order_list(self):
+        response = self.assert_constant_queries(2, '/api/orders/', self.place_orders)
+        self.assertEqual(len(response.data['results']), LARGE)
+        self.assertTrue(all(order['thumbnail'].endswith('b.jpg') for order in response.data['results']))
+
+    def test_order_detail(self):
+        order = self.place_order_with_items(SMALL)
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/orders/{order.pk}/')
+        order = self.place_order_with_items(LARGE)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/orders/{order.pk}/')
+        self.assertEqual(len(response.data['items']), LARGE)
+
+
+class CouponLimitMixin:
+    def make_coupon(self, model, limit):
+        now = timezone.now()
+        return model.objects.create(**{
+            'code': f'LIMIT-{model.__name__.upper()}',
+            'description': 'Usage limit',
+            'discount_type': 'fixed',
+            'discount_value': Decimal('1.00'),
+            getattr(model, 'USAGE_LIMIT_FIELD', 'maximum_uses'): limit,
+            'valid_from': now - timedelta(minutes=1),
+            'valid_until': now + timedelta(hours=1),
+        })
+
+    def assert_uses(self, coupon, claimed, limit):
+        coupon.refresh_from_db()
+        ledger = CouponRedemption.objects.filter(coupon_type=coupon._meta.label_lower, coupon_id=coupon.pk).count()
+        self.assertEqual((claimed, coupon.used_count, ledger), (limit, limit, limit))
+
+
+class CouponLimitTests(CouponLimitMixin, TestCase):
+    def test_redemptions_stop_at_the_limit(self):
+        for model in (GlobalDiscountCoupon, DiscountCode):
+            with self.subTest(model=model.__name__):
+                coupon = self.make_coupon(model, limit=5)
+                claimed = sum(redeem(coupon, discount_amount=Decimal('1.00')) is not None for _ in range(8))
+                self.assert_uses(coupon, claimed, 5)
+
+
+class CouponLookupTests(TestCase):
+    def setUp(self):
+        coupon_rules.clear()
+
+    def test_codes_match_whatever_case_they_were_saved_in(self):
+        now = timezone.now()
+        coupon = DiscountCode.objects.create(
+            code='Summer10', discount_type='percentage', discount_value=Decimal('10.00'),
+            valid_from=now - timedelta(minutes=1), valid_until=now + timedelta(hours=1),
+        )
+        for typed in ('Summer10', 'summer10', ' SUMMER10 '):
+            with self.subTest(typed=typed):
+                self.assertEqual(coupon_rules.get(DiscountCode, typed).pk, coupon.pk)
+        self.assertIsNone(coupon_rules.get(DiscountCode, 'winter10'))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCouponTests(CouponLimitMixin, TransactionTestCase):
+    threads = 8
+    attempts = 5
+    limit = 10
+
+    def test_parallel_redemptions_stop_at_the_limit(self):
+        coupon = self.make_coupon(GlobalDiscountCoupon, limit=self.limit)
+        barrier = threading.Barrier(self.threads)
+        lock = threading.Lock()
+        totals = {'claimed': 0, 'errors': []}
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.attempts):
+                    try:
+                        if redeem(coupon, discount_amount=coupon.discount_value) is not None:
+                            with lock:
+                                totals['claimed'] += 1
+                    except Exception as error:
+                        with lock:
+                            totals['errors'].append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(totals['errors'], [])
+        self.assert_uses(coupon, totals['claimed'], self.limit)
+
+
+class SuggestionTests(TestCase):
+    def test_ranking_covers_every_match(self):
+        category = Category.objects.create(name='Shirts')
+        Product.objects.bulk_create(
+            Product(name=f'Sa {i:03d}', description='x', price=Decimal('1.00'), category=category, brand='Acme')
+            for i in range(300)
+        )
+        Product.objects.create(name='Plain tee', description='x', price=Decimal('1.00'), category=category, brand='Sunrise')
+        index = SuggestionIndex()
+        index.rebuild()
+
+        # The category and the brand sort after 300 product keys but outrank them
+        suggestions = index.suggest('s', limit=3)
+        self.assertEqual([item['type'] for item in suggestions], ['category', 'brand', 'product'])
+        self.assertEqual([item['text'] for item in suggestions[:2]], ['Shirts', 'Sunrise'])
+
+        product = Product.objects.get(name='Sa 299')
+        product.name = 'Sb'
+        index.update_product(product)
+        self.assertEqual(index.suggest('sb'), [{'text': 'Sb', 'type': 'product', 'id': product.pk}])
+        index.remove_product(product.pk)
+        self.assertEqual(index.suggest('sb'), [])
+
+
+class ConditionalGetTests(TestCase):
+    """ETags come from the database, so a change made by another worker process changes them too."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Shirts')
+        self.product = Product.objects.create(name='Shirt', description='cotton', price=Decimal('20.00'), category=self.category)
+        self.image = ProductImage.objects.create(product=self.product, image='products/a.jpg', is_primary=True)
+        self.detail_url = f'/api/products/{self.product.pk}/'
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assert_changes(self, url, change):
+        before = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=before).status_code, 304)
+        change()
+        self.assertNotEqual(self.etag(url), before)
+
+    def test_catalog_version_alone_does_not_change_validators(self):
+        before = self.etag(self.detail_url)
+        bump_catalog_version()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=before).status_code, 304)
+
+    def test_review_changes_the_product_etag(self):
+        user = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='secret')
+        self.assert_changes(self.detail_url, lambda: ProductReview.objects.create(
+            product=self.product, user=user, rating=4, title='Good', comment='Fits well',
+        ))
+
+    def test_image_delete_changes_the_product_etags(self):
+        self.assert_changes('/api/products/', self.image.delete)
+        ProductImage.objects.create(product=self.product, image='products/b.jpg', is_primary=True)
+        self.assert_changes(self.detail_url, lambda: self.product.images.all().delete())
+
+    def test_category_rename_changes_the_etags(self):
+        def rename():
+            self.category.name = 'Tops'
+            self.category.save()
+        self.assert_changes('/api/products/categories/', rename)
+        self.assert_changes(self.detail_url, lambda: Category.objects.filter(pk=self.category.pk).update(
+            name='Tees', updated_at=timezone.now(),
+        ))
+
+    def test_product_delete_changes_the_list_etag(self):
+        other = Product.objects.create(name='Tee', description='cotton', price=Decimal('10.00'), category=self.category)
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now())
+        self.assert_changes('/api/products/', other.delete)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Shirts')
+        Product.objects.create(name='Linen shirt', description='summer', price=Decimal('30.00'), category=category, brand='Acme')
+        Product.objects.create(name='Denim jacket', description='winter', price=Decimal('60.00'), category=category, brand='Acme')
+
+    def names(self, query):
+        response = self.client.get('/api/products/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['name'] for product in response.data['results'])
+
+    def test_queries(self):
+        self.assertEqual(self.names('lin'), ['Linen shirt'])
+        self.assertEqual(self.names('acme jac'), ['Denim jacket'])
+        self.assertEqual(self.names(''), ['Denim jacket', 'Linen shirt'])
+
+    def test_query_without_searchable_terms_matches_nothing(self):
+        for query in ('!!', 'a', '-'):
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query), [])
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shirts')
+        self.product = Product.objects.create(name='Shirt', description='cotton', price=Decimal('100.00'), category=category)
+        self.override = ProductVariant.objects.create(
+            product=self.product, size='L', color='Blue', sku='SHIRT-L', stock_quantity=5, price=Decimal('120.00'),
+        )
+        self.plain = ProductVariant.objects.create(product=self.product, size='M', color='Blue', sku='SHIRT-M', stock_quantity=5)
+        user = User.objects.create_user(username='shopper', email='shopper@example.com', password='secret')
+        self.cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=self.cart, product_variant=self.override, quantity=1)
+        CartItem.objects.create(cart=self.cart, product_variant=self.plain, quantity=1)
+        Cart.refresh_totals([self.cart.pk])
+
+    def prices(self):
+        self.product.refresh_from_db()
+        self.override.refresh_from_db()
+        self.plain.refresh_from_db()
+        self.cart.refresh_from_db()
+        return self.product.price, self.override.price, self.plain.price, self.cart.subtotal_amount
+
+    def test_variant_overrides_are_repriced_and_rolled_back(self):
+        plan = repricing.plan(Product.objects.all(), 'percentage', -10)
+        self.assertEqual(plan.variant_ids.tolist(), [self.override.pk])
+        snapshot = repricing.apply(plan)
+        self.assertEqual(self.prices(), (Decimal('90.00'), Decimal('108.00'), None, Decimal('198.00')))
+
+        repricing.rollback(snapshot)
+        self.assertEqual(self.prices(), (Decimal('100.00'), Decimal('120.00'), None, Decimal('220.00')))
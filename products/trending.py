@@ -0,0 +1,138 @@
+"""
+Trending products from time-decayed activity scores.
+
+Each order, wishlist add, cart add and review adds ``weight`` to the
+product's score, decayed exponentially with a half-life of
+TRENDING_HALF_LIFE_DAYS. Instead of decaying every stored score as time
+passes, an event at time ``t`` adds ``weight * 2 ** ((t - epoch) / half_life)``
+with the fixed TRENDING_EPOCH (forward decay). Every score is then the true
+decayed score multiplied by the same factor, so the ranking is correct at any moment and each event is
+a single UPDATE. Top-K for a gender or category is one index scan on
+ProductTrendingScore.
+
+Scores grow by a factor of two every half-life, so a float lasts about a
+thousand half-lives past the epoch (~19 years at the default 7 days).
+refresh_trending_scores recomputes all scores from recent history; run it
+periodically as a backfill and after changing TRENDING_HALF_LIFE_DAYS or
+moving TRENDING_EPOCH forward.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from cart.models import CartItem
+from orders.models import OrderItem
+
+from .models import Product, ProductReview, ProductTrendingScore, Wishlist
+
+DEFAULT_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+EVENT_WEIGHTS = {
+    'order': 5.0,
+    'wishlist': 3.0,
+    'review': 2.0,
+    'cart': 1.0,
+}
+
+
+def epoch():
+    return getattr(settings, 'TRENDING_EPOCH', DEFAULT_EPOCH)
+
+
+def half_life_seconds():
+    return getattr(settings, 'TRENDING_HALF_LIFE_DAYS', 7) * 86400
+
+
+def decayed_weight(weight, at=None):
+    at = at or timezone.now()
+    return weight * 2 ** ((at - epoch()).total_seconds() / half_life_seconds())
+
+
+def record_event(product_id, event, quantity=1, at=None):
+    increment = decayed_weight(EVENT_WEIGHTS[event] * quantity, at)
+    if ProductTrendingScore.objects.filter(product_id=product_id).update(score=F('score') + increment):
+        return
+    product = Product.objects.filter(pk=product_id).values('gender', 'category_id').first()
+    if product is None:
+        return
+    try:
+        with transaction.atomic():
+            ProductTrendingScore.objects.create(product_id=product_id, score=increment, **product)
+    except IntegrityError:
+        # Another request created the row first
+        ProductTrendingScore.objects.filter(product_id=product_id).update(score=F('score') + increment)
+
+
+def record_events(event, product_quantities, at=None):
+    """Record ``event`` for (product_id, quantity) pairs, e.g. bulk-created order items."""
+    totals = {}
+    for product_id, quantity in product_quantities:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    for product_id, quantity in totals.items():
+        record_event(product_id, event, quantity, at)
+
+
+def sync_product(product):
+    ProductTrendingScore.objects.filter(product_id=product.pk).exclude(
+        gender=product.gender, category_id=product.category_id
+    ).update(gender=product.gender, category_id=product.category_id)
+
+
+def top_products(limit=8, gender=None, category_id=None):
+    """Active products ordered by trending score, topped up with the newest products."""
+    scores = ProductTrendingScore.objects.filter(product__is_active=True)
+    if gender:
+        scores = scores.filter(gender=gender)
+    if category_id:
+        scores = scores.filter(category_id=category_id)
+    product_ids = list(scores.order_by('-score').values_list('product_id', flat=True)[:limit])
+
+    if len(product_ids) < limit:
+        newest = Product.objects.filter(is_active=True).exclude(pk__in=product_ids)
+        if gender:
+            newest = newest.filter(gender=gender)
+        if category_id:
+            newest = newest.filter(category_id=category_id)
+        product_ids += list(newest.order_by('-created_at').values_list('id', flat=True)[:limit - len(product_ids)])
+    return product_ids
+
+
+def _activity(since):
+    """Yield (product_id, event, quantity, at) for all activity after ``since``."""
+    yield from (
+        (product_id, 'order', quantity, at)
+        for product_id, quantity, at in OrderItem.objects.filter(created_at__gte=since)
+        .values_list('product_variant__product_id', 'quantity', 'created_at').iterator()
+    )
+    yield from (
+        (product_id, 'cart', 1, at)
+        for product_id, at in CartItem.objects.filter(created_at__gte=since)
+        .values_list('product_variant__product_id', 'created_at').iterator()
+    )
+    for model, event in ((Wishlist, 'wishlist'), (ProductReview, 'review')):
+        yield from (
+            (product_id, event, 1, at)
+            for product_id, at in model.objects.filter(created_at__gte=since)
+            .values_list('product_id', 'created_at').iterator()
+        )
+
+
+def rebuild_scores(days=90, batch_size=1000):
+    """Recompute every score from the last ``days`` days of activity. Returns the number of rows."""
+    since = timezone.now() - timezone.timedelta(days=days)
+    scores = {}
+    for product_id, event, quantity, at in _activity(since):
+        scores[product_id] = scores.get(product_id, 0) + decayed_weight(EVENT_WEIGHTS[event] * quantity, at)
+
+    products = Product.objects.filter(pk__in=list(scores)).values_list('id', 'gender', 'category_id')
+    rows = [
+        ProductTrendingScore(product_id=product_id, score=scores[product_id], gender=gender, category_id=category_id)
+        for product_id, gender, category_id in products.iterator()
+    ]
+    with transaction.atomic():
+        ProductTrendingScore.objects.all().delete()
+        ProductTrendingScore.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -8,7 +8,10 @@ urlpatterns = [
     path('<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('<int:product_id>/reviews/', views.ProductReviewListCreateView.as_view(), name='product-reviews'),
     path('search/', views.product_search, name='product-search'),
+    path('suggest/', views.product_suggestions, name='product-suggestions'),
     path('trending/', views.trending_products, name='trending-products'),
+    path('variants/', views.product_variants_batch, name='product-variants-batch'),
+    path('<int:product_id>/variants/', views.product_variants, name='product-variants'),
     path('category/<int:category_id>/', views.category_products, name='category-products'),
     path('<int:product_id>/discounts/', views.product_discounts, name='product-discounts'),
     path('<int:product_id>/apply-discount/', views.apply_product_discount, name='apply-product-discount'),
@@ -16,5 +19,6 @@ urlpatterns = [
     path('<int:product_id>/wishlist/', views.toggle_wishlist, name='toggle-wishlist'),
     path('global-coupons/', views.global_discount_coupons, name='global-discount-coupons'),
     path('apply-global-discount/', views.apply_global_discount, name='apply-global-discount'),
+    path('cache-stats/', views.catalog_cache_stats, name='catalog-cache-stats'),
     path('validate-global-discount/', views.validate_global_discount, name='validate-global-discount'),
 ]
@@ -1,10 +1,22 @@
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Category, Product, ProductReview, ProductDiscount, Wishlist, GlobalDiscountCoupon
+from fashion_store.cache import CatalogCacheMixin, cache_catalog_response, catalog_stats
+from fashion_store.pagination import KeysetPagination, paginated_response
+from fashion_store.streaming import ndjson_response, wants_stream
+from .models import Category, Product, ProductReview, ProductDiscount, ProductVariant, Wishlist, GlobalDiscountCoupon
+from . import pricing
+from .conditional import catalog_condition, category_state, product_detail_state, product_list_state
+from .coupons import coupon_rules, redeem
+from .facets import GENDER_CODES, facet_index
+from .filters import filter_by_variants
+from .search import search_products
+from .suggest import suggestion_index
+from .trending import top_products
 from .serializers import (
     CategorySerializer, 
     ProductSerializer, 
@@ -12,11 +24,15 @@ from .serializers import (
     ProductCreateUpdateSerializer,
     ProductReviewSerializer,
     WishlistSerializer,
-    GlobalDiscountCouponSerializer
+    GlobalDiscountCouponSerializer,
+    primary_image_prefetch,
+    requested_fields,
+    review_preview_prefetch,
 )
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+@method_decorator(catalog_condition(category_state), name='get')
+class CategoryListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
@@ -27,6 +43,7 @@ class CategoryListCreateView(generics.ListCreateAPIView):
         return [IsAdminUser()]
 
 
+@method_decorator(catalog_condition(category_state), name='get')
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -38,11 +55,11 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [IsAdminUser()]
 
 
-class ProductListCreateView(generics.ListCreateAPIView):
-    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images', 'reviews', 'variants')
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+@method_decorator(catalog_condition(product_list_state), name='get')
+class ProductListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
+    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related(primary_image_prefetch())
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['category__name', 'gender', 'brand']
-    search_fields = ['name', 'description', 'brand']
     ordering_fields = ['price', 'created_at', 'name']
     ordering = ['-created_at']
 
@@ -68,7 +85,7 @@ class ProductListCreateView(generics.ListCreateAPIView):
         max_price = params.get('max_price') or params.get('price__lte')
         size = params.get('size')
         color = params.get('color')
-        q = params.get('q')
+        q = params.get('q') or params.get('search')
 
         if gender_or_category:
             gender_map = {
@@ -90,24 +107,39 @@ class ProductListCreateView(generics.ListCreateAPIView):
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
 
-        if size:
-            queryset = queryset.filter(variants__size=size)
+        queryset = filter_by_variants(queryset, size=size, color=color)
 
-        if color:
-            queryset = queryset.filter(variants__color__icontains=color)
+        if q:
+            queryset = search_products(queryset, q)
+
+        return queryset
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true') and isinstance(response.data, dict):
+            response.data['facets'] = self.get_facets()
+        return response
+
+    def get_facets(self):
+        params = self.request.query_params
+        q = params.get('q') or params.get('search')
+        matching_ids = None
         if q:
-            queryset = queryset.filter(
-                Q(name__icontains=q) |
-                Q(description__icontains=q) |
-                Q(brand__icontains=q)
-            )
+            matching_ids = search_products(Product.objects.filter(is_active=True), q).values_list('id', flat=True)
+        return facet_index.facet_counts(params, restrict_to_ids=matching_ids)
 
-        return queryset.distinct()
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        # Rank search results by relevance unless the client asked for an ordering
+        if (params.get('q') or params.get('search')) and not params.get('ordering') and 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
 
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images', 'variants', 'reviews')
+@method_decorator(catalog_condition(product_detail_state), name='get')
+class ProductDetailView(CatalogCacheMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Product.objects.filter(is_active=True).select_related('category')
     serializer_class = ProductSerializer
 
     def get_permissions(self):
@@ -115,10 +147,23 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
             return []
         return [IsAdminUser()]
 
+    def get_queryset(self):
+        # Only prefetch the relations that ?fields= asks for; variants embed the product's image
+        fields = requested_fields(self.request)
+        prefetches = {
+            'images': ({'images', 'variants'}, 'images'),
+            'variants': ({'variants'}, 'variants'),
+            'reviews': ({'review_preview'}, review_preview_prefetch()),
+        }
+        return super().get_queryset().prefetch_related(*(
+            prefetch for needed_by, prefetch in prefetches.values() if fields is None or needed_by & fields
+        ))
+
 
 class ProductReviewListCreateView(generics.ListCreateAPIView):
     serializer_class = ProductReviewSerializer
     permission_classes = []  # Allow anonymous users to view reviews
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         product_id = self.kwargs['product_id']
@@ -132,7 +177,18 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user, product_id=product_id)
 
 
+def product_list_response(request, queryset):
+    """Paginated product list, or an NDJSON stream with ?stream=1"""
+    context = {'request': request}
+    if wants_stream(request):
+        return ndjson_response(queryset, lambda product: ProductListSerializer(product, context=context).data)
+    return paginated_response(
+        request, queryset, lambda page: ProductListSerializer(page, many=True, context=context).data
+    )
+
+
 @api_view(['GET'])
+@catalog_condition(product_list_state)
 def product_search(request):
     """Advanced product search with filters"""
     query = request.GET.get('q', '')
@@ -143,14 +199,10 @@ def product_search(request):
     size = request.GET.get('size')
     color = request.GET.get('color')
     
-    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images', 'variants')
+    queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related(primary_image_prefetch())
     
     if query:
-        queryset = queryset.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(brand__icontains=query)
-        )
+        queryset = search_products(queryset, query)
     
     if category:
         queryset = queryset.filter(category__name__icontains=category)
@@ -164,37 +216,127 @@ def product_search(request):
     if max_price:
         queryset = queryset.filter(price__lte=max_price)
     
-    if size:
-        queryset = queryset.filter(variants__size=size)
-    
-    if color:
-        queryset = queryset.filter(variants__color__icontains=color)
-    
-    serializer = ProductListSerializer(queryset.distinct(), many=True, context={'request': request})
-    return Response(serializer.data)
+    queryset = filter_by_variants(queryset, size=size, color=color)
+    if 'search_rank' in queryset.query.annotations:
+        queryset = queryset.order_by('-search_rank', '-created_at')
+
+    return product_list_response(request, queryset)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def product_suggestions(request):
+    """Type-ahead completions for product names, brands and categories"""
+    prefix = request.GET.get('prefix', '') or request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(suggestion_index.suggest(prefix, limit=limit))
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalog_response(timeout=60)
 def trending_products(request):
-    """Get trending products based on recent orders and reviews"""
-    # This is a simplified version - in production, you'd use more sophisticated algorithms
-    trending = Product.objects.filter(is_active=True).select_related('category').prefetch_related('images')[:8]
+    """Get trending products, optionally for one gender and/or category"""
+    gender = request.GET.get('gender')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 50)
+        category_id = int(request.GET['category_id']) if request.GET.get('category_id') else None
+    except ValueError:
+        return Response({'error': 'limit and category_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    product_ids = top_products(limit, gender=GENDER_CODES.get(gender, gender), category_id=category_id)
+    products = Product.objects.select_related('category').prefetch_related(primary_image_prefetch()).in_bulk(product_ids)
+    trending = [products[pk] for pk in product_ids if pk in products]
     serializer = ProductListSerializer(trending, many=True, context={'request': request})
     return Response(serializer.data)
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])
+@catalog_condition(product_list_state)
+@cache_catalog_response()
 def category_products(request, category_id):
     """Get products by category"""
     try:
         category = Category.objects.get(id=category_id)
-        products = Product.objects.filter(category=category, is_active=True).select_related('category').prefetch_related('images')
-        serializer = ProductListSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data)
+        products = Product.objects.filter(category=category, is_active=True).select_related('category').prefetch_related(primary_image_prefetch())
+        return product_list_response(request, products)
     except Category.DoesNotExist:
         return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+VARIANT_FIELDS = ('id', 'product_id', 'size', 'color', 'sku', 'stock_quantity', 'price')
+MAX_VARIANT_BATCH = 100
+
+
+def variant_rows(product_ids):
+    """Active variants of active products in one query, in-stock variants first."""
+    return ProductVariant.objects.filter(
+        product_id__in=product_ids, product__is_active=True, is_active=True
+    ).order_by(
+        ExpressionWrapper(Q(stock_quantity__gt=0), output_field=BooleanField()).desc(), 'id'
+    ).values(*VARIANT_FIELDS)
+
+
+def stock_matrix(product_id, rows):
+    """Size x color grid of stock and variant ids; None where no variant exists."""
+    sizes = list(dict.fromkeys(row['size'] for row in rows))
+    colors = list(dict.fromkeys(row['color'] for row in rows))
+    stock = [[None] * len(colors) for _ in sizes]
+    variant_ids = [[None] * len(colors) for _ in sizes]
+    for row in rows:
+        i, j = sizes.index(row['size']), colors.index(row['color'])
+        stock[i][j] = row['stock_quantity']
+        variant_ids[i][j] = row['id']
+    return {'product_id': product_id, 'sizes': sizes, 'colors': colors, 'stock': stock, 'variant_ids': variant_ids}
+
+
+def _variant_data(row):
+    return {
+        'id': row['id'],
+        'size': row['size'],
+        'color': row['color'],
+        'sku': row['sku'],
+        'stock_quantity': row['stock_quantity'],
+        'price': float(row['price']) if row['price'] is not None else None,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalog_response(timeout=30)
+def product_variants(request, product_id):
+    """Variants of a product for quick-add, or a size x color stock matrix with ?matrix=1"""
+    rows = list(variant_rows([product_id]))
+    if request.GET.get('matrix') in ('1', 'true'):
+        return Response(stock_matrix(product_id, sorted(rows, key=lambda row: row['id'])))
+    return Response([_variant_data(row) for row in rows])
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalog_response(timeout=30)
+def product_variants_batch(request):
+    """Stock matrices for up to 100 products at once (?ids=1,2,3)"""
+    try:
+        product_ids = list(dict.fromkeys(int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()))
+    except ValueError:
+        return Response({'error': 'ids must be a comma-separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not product_ids:
+        return Response({'error': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(product_ids) > MAX_VARIANT_BATCH:
+        return Response({'error': f'At most {MAX_VARIANT_BATCH} ids are allowed'}, status=status.HTTP_400_BAD_REQUEST)
+
+    per_product = {pk: [] for pk in product_ids}
+    for row in variant_rows(product_ids).order_by('id'):
+        per_product[row['product_id']].append(row)
+    return Response({str(pk): stock_matrix(pk, rows) for pk, rows in per_product.items()})
+
+
 @api_view(['GET'])
 def product_discounts(request, product_id):
     """Get available discount codes for a specific product"""
@@ -237,27 +379,17 @@ def apply_product_discount(request, product_id):
         if not code:
             return Response({'error': 'Discount code is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            discount = ProductDiscount.objects.get(
-                product=product,
-                code=code,
-                is_active=True
-            )
-        except ProductDiscount.DoesNotExist:
+        discount = coupon_rules.get(ProductDiscount, code)
+        if discount is None or not discount.is_active or discount.product_id != product.id:
             return Response({'error': 'Invalid discount code for this product'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not discount.can_be_used(quantity):
             return Response({'error': 'Discount code cannot be used with this quantity or is expired'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calculate discount amount
-        if discount.discount_type == 'percentage':
-            discount_amount = (product.price * discount.discount_value) / 100
-        else:  # fixed amount
-            discount_amount = discount.discount_value
+        discount_amount = pricing.coupon_discount(discount, product.price)
         
-        # Update usage count
-        discount.used_count += 1
-        discount.save()
+        if redeem(discount, request.user, discount_amount) is None:
+            return Response({'error': 'Discount code has reached its usage limit or expired'}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': f'Discount code "{code}" applied successfully!',
@@ -277,7 +409,7 @@ class WishlistListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user).select_related('product', 'product__category').prefetch_related('product__images')
+        return Wishlist.objects.filter(user=self.request.user).select_related('product', 'product__category').prefetch_related(primary_image_prefetch('product__images'))
 
 
 @api_view(['POST', 'DELETE'])
@@ -312,6 +444,8 @@ def toggle_wishlist(request, product_id):
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_catalog_response(timeout=60)
 def global_discount_coupons(request):
     """Get all available global discount coupons"""
     coupons = GlobalDiscountCoupon.objects.filter(is_active=True).order_by('-created_at')
@@ -335,22 +469,25 @@ def global_discount_coupons(request):
     return Response(coupon_data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def catalog_cache_stats(request):
+    """Hit and miss counters of the catalog response cache (admin only)"""
+    return Response(catalog_stats())
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def apply_global_discount(request):
     """Apply a global discount coupon"""
     code = request.data.get('code', '').strip().upper()
-    order_amount = float(request.data.get('order_amount', 0))
+    order_amount = pricing.to_amount(request.data.get('order_amount', 0))
     
     if not code:
         return Response({'error': 'Discount code is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        coupon = GlobalDiscountCoupon.objects.get(
-            code=code,
-            is_active=True
-        )
-    except GlobalDiscountCoupon.DoesNotExist:
+    coupon = coupon_rules.get(GlobalDiscountCoupon, code)
+    if coupon is None or not coupon.is_active:
         return Response({'error': 'Invalid discount code'}, status=status.HTTP_400_BAD_REQUEST)
     
     if not coupon.is_valid():
@@ -361,9 +498,8 @@ def apply_global_discount(request):
     if discount_amount == 0:
         return Response({'error': f'Minimum order amount of ${coupon.minimum_order_amount} required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Update usage count
-    coupon.used_count += 1
-    coupon.save()
+    if redeem(coupon, request.user, discount_amount) is None:
+        return Response({'error': 'Discount code has reached its usage limit or expired'}, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
         'message': f'Discount code "{code}" applied successfully!',
@@ -378,17 +514,13 @@ def apply_global_discount(request):
 def validate_global_discount(request):
     """Validate a global discount coupon without applying it"""
     code = request.GET.get('code', '').strip().upper()
-    order_amount = float(request.GET.get('order_amount', 0))
+    order_amount = pricing.to_amount(request.GET.get('order_amount', 0))
     
     if not code:
         return Response({'error': 'Discount code is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        coupon = GlobalDiscountCoupon.objects.get(
-            code=code,
-            is_active=True
-        )
-    except GlobalDiscountCoupon.DoesNotExist:
+    coupon = coupon_rules.get(GlobalDiscountCoupon, code)
+    if coupon is None or not coupon.is_active:
         return Response({'error': 'Invalid discount code'}, status=status.HTTP_400_BAD_REQUEST)
     
     if not coupon.is_valid():